@@ -8,6 +8,9 @@ de mercado, construção de prompts para o modelo de IA e tomada de decisão fin
 from typing import Dict, Any, List, Sequence
 from datetime import datetime
 
+# Tamanho máximo (caracteres) de cada trecho de relatório incluído no prompt
+REPORT_EXCERPT_CHARS = 200
+
 
 def _safe_mean(values: Sequence[float], default: float = 0.0) -> float:
     """Calcula média de forma segura, evitando divisão por zero."""
@@ -355,7 +358,7 @@ def analyze_market_reports(
     negative_keywords = ["aguardar", "queda", "baixa", "desvalorização", "negativo", "risco", "desfavorável"]
     
     all_text = " ".join(
-        f"{rel.get('content', '')} {rel.get('metadata', {})}"
+        f"{rel.get('text') or rel.get('content', '')} {rel.get('metadata', {})}"
         for rel in relatorios
     ).lower()
     
@@ -401,6 +404,21 @@ def calculate_decision_score(
     return round(total_score, 3)
 
 
+def _report_excerpt(rel: Dict[str, Any], max_chars: int = REPORT_EXCERPT_CHARS) -> str:
+    """
+    Texto do trecho retornado pelo RAG, cortado no fim de frase (ou palavra)
+    mais próximo de `max_chars`.
+    """
+    text = (rel.get("text") or rel.get("content") or "").strip()
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    end = cut.rfind(". ")
+    if end >= max_chars // 2:
+        return cut[:end + 1]
+    return cut.rsplit(" ", 1)[0] + "..."
+
+
 def build_ai_prompt(
     payload: Dict[str, Any],
     clima: Dict[str, Any],
@@ -566,11 +584,11 @@ def build_ai_prompt(
     # Extrair insights relevantes dos relatórios (apenas se muito relevantes)
     insights_relatorios = []
     if relatorios:
-        for rel in relatorios[:2]:  # Limitar a 2 relatórios mais relevantes
-            content = rel.get("content", "")
+        for rel in relatorios[:2]:  # Limitar a 2 trechos mais relevantes
+            content = rel.get("text") or rel.get("content", "")
             # Buscar menções específicas ao tipo de café ou região
             if tipo_cafe.lower() in content.lower() or estado.lower() in content.lower():
-                insights_relatorios.append(content[:150] + "...")  # Limitar tamanho
+                insights_relatorios.append(_report_excerpt(rel))
     
     prompt = f"""
         Você é um especialista em cafeicultura e comercialização de café.
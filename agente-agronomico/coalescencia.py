@@ -0,0 +1,71 @@
+"""
+Coalescência (single-flight) de requisições idênticas a /recommend.
+
+Quando uma cooperativa envia vários lotes iguais ao mesmo tempo, cada
+requisição repetiria as mesmas buscas de clima, preço e RAG e a mesma
+geração no Ollama. Requisições concorrentes com a mesma chave passam a
+aguardar uma única execução em andamento e recebem o mesmo resultado.
+"""
+
+import asyncio
+
+from models import Requisicao
+
+
+def _normalizar(valor) -> str:
+    return " ".join(str(valor or "").lower().split())
+
+
+def chave_requisicao(req: Requisicao) -> tuple:
+    """Chave da requisição com caixa e espaços padronizados."""
+    return (
+        _normalizar(req.tipo_cafe),
+        req.data_colheita.strip(),
+        float(req.quantidade),
+        _normalizar(req.cidade),
+        _normalizar(req.estado),
+        _normalizar(req.estado_cafe),
+    )
+
+
+class Coalescedor:
+    """
+    Execuções em andamento por chave. A primeira requisição inicia a
+    execução; as concorrentes com a mesma chave aguardam o mesmo resultado
+    (ou a mesma exceção). Terminada a execução a chave é liberada, então
+    não há cache: requisições posteriores executam de novo.
+    """
+
+    def __init__(self):
+        self._em_andamento = {}
+        self.execucoes = 0
+        self.coalescidas = 0
+
+    async def run(self, key, funcao):
+        future = self._em_andamento.get(key)
+        if future is None:
+            self.execucoes += 1
+            future = asyncio.ensure_future(funcao())
+            self._em_andamento[key] = future
+            future.add_done_callback(lambda f: self._finalizar(key, f))
+        else:
+            self.coalescidas += 1
+            print("[COALESCÊNCIA] Requisição idêntica em andamento; aguardando o mesmo resultado")
+        # shield: um cliente que desconecta não cancela a execução dos demais
+        return await asyncio.shield(future)
+
+    def _finalizar(self, key, future):
+        if self._em_andamento.get(key) is future:
+            del self._em_andamento[key]
+        if not future.cancelled():
+            future.exception()  # marca a exceção como tratada mesmo sem ninguém aguardando
+
+    def stats(self) -> dict:
+        return {
+            "em_andamento": len(self._em_andamento),
+            "execucoes": self.execucoes,
+            "coalescidas": self.coalescidas,
+        }
+
+
+coalescedor = Coalescedor()
@@ -0,0 +1,96 @@
+"""
+Cache das explicações geradas pelo Ollama.
+
+Produtores da mesma região, com o mesmo tipo, estado e quantidade de café
+e a mesma data de colheita, consultados no mesmo dia, chegam ao mesmo
+prompt. A chave do cache é uma impressão digital canônica das entradas da
+explicação, e não o prompt, para que essas requisições reaproveitem a mesma
+explicação sem nova geração.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from datetime import date
+
+EXPLICACAO_CACHE_MAX_ENTRIES = int(os.getenv("EXPLICACAO_CACHE_MAX_ENTRIES", "256"))
+EXPLICACAO_CACHE_TTL = float(os.getenv("EXPLICACAO_CACHE_TTL", "21600"))
+# Casas decimais dos scores na chave (scores mais próximos que isso compartilham a explicação)
+EXPLICACAO_CACHE_SCORE_DECIMALS = int(os.getenv("EXPLICACAO_CACHE_SCORE_DECIMALS", "2"))
+
+
+def _normalizar(valor) -> str:
+    """Padroniza caixa e espaços de um campo textual da chave."""
+    return " ".join(str(valor or "").lower().split())
+
+
+def chave_explicacao(payload: dict, analise: dict, modelo: str) -> tuple:
+    """
+    Impressão digital das entradas da explicação.
+
+    Combina a decisão, os scores arredondados, a região, o tipo, o estado e
+    a quantidade do café, a data de colheita e o dia atual (o prompt cita os
+    dias desde a colheita e o status de armazenamento) e as datas dos dados
+    usados (primeiro dia da previsão do tempo e cotação mais recente):
+    quando a previsão ou a cotação é atualizada, a chave muda.
+    """
+    previsao = (payload.get("clima") or {}).get("daily_forecast") or [{}]
+    return (
+        modelo,
+        analise["decisao"],
+        *(round(analise[campo], EXPLICACAO_CACHE_SCORE_DECIMALS)
+          for campo in ("decision_score", "climate_score", "price_score", "market_score")),
+        _normalizar(payload.get("cidade")),
+        _normalizar(payload.get("estado")),
+        _normalizar(payload.get("tipo_cafe")),
+        _normalizar(payload.get("estado_cafe")),
+        float(payload.get("quantidade") or 0),
+        str(payload.get("data_colheita", "")).strip(),
+        date.today().isoformat(),
+        str(previsao[0].get("date", "")),
+        str((payload.get("preco") or {}).get("data_mais_recente", "")),
+    )
+
+
+class ExplicacaoCache:
+    """Cache LRU com validade (TTL) das explicações, chaveado por `chave_explicacao`."""
+
+    def __init__(self, max_entries: int = EXPLICACAO_CACHE_MAX_ENTRIES, ttl: float = EXPLICACAO_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.time() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+explicacao_cache = ExplicacaoCache()
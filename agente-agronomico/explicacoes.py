@@ -0,0 +1,113 @@
+"""
+Geração assíncrona das explicações do modo rápido de /recommend.
+
+A decisão é devolvida imediatamente com o id de um job; a explicação é
+gerada em segundo plano pelo Ollama e consultada depois pelo cliente.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+from utils import CAMPOS_DECISAO, gerar_explicacao
+
+# Explicações geradas ao mesmo tempo (as demais aguardam na fila)
+EXPLICACAO_CONCURRENCY = int(os.getenv("EXPLICACAO_CONCURRENCY", "2"))
+# Jobs mantidos para consulta e por quanto tempo (segundos) após terminarem
+EXPLICACAO_JOBS_MAX = int(os.getenv("EXPLICACAO_JOBS_MAX", "1000"))
+EXPLICACAO_JOB_TTL = float(os.getenv("EXPLICACAO_JOB_TTL", "3600"))
+# Espera máxima (segundos) de uma consulta com ?wait=
+EXPLICACAO_MAX_WAIT = float(os.getenv("EXPLICACAO_MAX_WAIT", "60"))
+
+
+class ExplicacaoJob:
+    """Explicação de uma decisão, gerada em segundo plano."""
+
+    def __init__(self, analise: dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.analise = analise
+        self.status = "pending"
+        self.created_at = time.time()
+        self.finished_at = None
+        self.resultado = None
+        self.task = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "cancelled")
+
+    def as_dict(self) -> dict:
+        resultado = self.resultado or {}
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            **{campo: self.analise[campo] for campo in CAMPOS_DECISAO},
+            "explicacao_decisao": resultado.get("explicacao"),
+            "ollama_time_seconds": resultado.get("ollama_time_seconds"),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ExplicacaoJobs:
+    """
+    Jobs de explicação em memória, com no máximo EXPLICACAO_CONCURRENCY
+    gerações simultâneas no Ollama. Jobs terminados expiram após
+    EXPLICACAO_JOB_TTL segundos.
+    """
+
+    def __init__(self, concurrency: int = EXPLICACAO_CONCURRENCY,
+                 max_jobs: int = EXPLICACAO_JOBS_MAX, ttl: float = EXPLICACAO_JOB_TTL):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._jobs = OrderedDict()
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def start(self, analise: dict) -> ExplicacaoJob:
+        self._purge()
+        job = ExplicacaoJob(analise)
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    async def _run(self, job: ExplicacaoJob):
+        try:
+            async with self._semaphore:
+                job.status = "running"
+                job.resultado = await gerar_explicacao(job.analise)
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        finally:
+            job.finished_at = time.time()
+
+    def _purge(self):
+        now = time.time()
+        for job_id in [i for i, j in self._jobs.items() if j.done and now - j.finished_at > self.ttl]:
+            del self._jobs[job_id]
+        # Acima do limite, descarta primeiro os mais antigos já terminados
+        for job_id in [i for i, j in self._jobs.items() if j.done][:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: ExplicacaoJob, timeout: float):
+        """Aguarda o job terminar por até `timeout` segundos."""
+        if job.done or timeout <= 0:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(job.task), min(timeout, EXPLICACAO_MAX_WAIT))
+        except asyncio.TimeoutError:
+            pass
+
+    async def shutdown(self):
+        tasks = [job.task for job in self._jobs.values() if not job.done]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+explicacao_jobs = ExplicacaoJobs()
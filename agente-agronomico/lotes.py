@@ -0,0 +1,134 @@
+"""
+Recomendação em lote (/recommend/batch), para cooperativas com muitos lotes.
+
+Os dados externos são buscados uma vez por valor distinto (ver
+`fetch_lotes_parallel`), os scores de cada componente são calculados uma vez
+por combinação distinta de entradas e as explicações são geradas com
+concorrência limitada, uma por chave de cache, à medida que o Ollama libera.
+"""
+
+import asyncio
+import os
+import time
+
+from agronomic_agent import analyze_climate_factors, analyze_market_reports, analyze_price_trends
+from utils import (
+    CAMPOS_DECISAO,
+    analisar_decisao,
+    consulta_rag,
+    fetch_lotes_parallel,
+    gerar_explicacao,
+    normalizar_campo,
+    payload_analise,
+)
+
+# Lotes aceitos por requisição
+BATCH_MAX_LOTES = int(os.getenv("BATCH_MAX_LOTES", "100"))
+# Explicações geradas ao mesmo tempo no Ollama para um lote
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "2"))
+
+
+def analisar_lotes(payloads: list) -> list:
+    """
+    Decisão de cada lote. Cada score depende só de parte das entradas (o
+    de clima, da cidade, tipo, estado do café e colheita; o de mercado, da
+    consulta RAG), então é calculado uma vez por combinação distinta e
+    reaproveitado pelos lotes iguais nessa parte.
+
+    Returns:
+        list: a análise de cada lote ou a exceção que impediu a decisão
+    """
+    memo = {}
+
+    def score(funcao, chave, *args):
+        if (funcao, chave) not in memo:
+            try:
+                memo[(funcao, chave)] = (funcao(*args), None)
+            except Exception as e:
+                memo[(funcao, chave)] = (None, e)
+        valor, erro = memo[(funcao, chave)]
+        if erro is not None:
+            raise erro
+        return valor
+
+    analises = []
+    for payload in payloads:
+        tipo_cafe = payload["tipo_cafe"]
+        estado_cafe = payload["estado_cafe"]
+        data_colheita = payload["data_colheita"]
+        try:
+            scores = (
+                score(analyze_climate_factors,
+                      (normalizar_campo(payload["cidade"]), normalizar_campo(payload["estado"]), tipo_cafe, estado_cafe, data_colheita),
+                      payload["clima"], tipo_cafe, estado_cafe, data_colheita),
+                score(analyze_price_trends,
+                      (normalizar_campo(tipo_cafe), payload["quantidade"], estado_cafe, data_colheita),
+                      payload["preco"], payload["quantidade"], estado_cafe, data_colheita),
+                score(analyze_market_reports,
+                      (consulta_rag(payload), estado_cafe, tipo_cafe),
+                      payload["relatorios"], estado_cafe, tipo_cafe),
+            )
+            analises.append(analisar_decisao(payload, scores))
+        except Exception as e:
+            analises.append(e)
+    return analises
+
+
+async def recomendar_lotes(lotes: list):
+    """
+    Eventos de /recommend/batch, na ordem:
+
+    - decision: decisão e scores de um lote (`index` na lista enviada),
+      emitidos para todos os lotes assim que a análise termina
+    - error: lote cuja análise falhou (sem explicação)
+    - result: decisão e explicação de um lote, à medida que ficam prontas
+    - done: totais e duração
+    """
+    start = time.perf_counter()
+    dados = await fetch_lotes_parallel(lotes)
+    payloads = [payload_analise(lote, *dados_lote) for lote, dados_lote in zip(lotes, dados)]
+    analises = analisar_lotes(payloads)
+
+    # Lotes com a mesma chave de cache compartilham uma única geração: a chave
+    # cobre todas as entradas do prompt (inclusive colheita e quantidade), então
+    # a explicação de `indices[0]` vale para o grupo todo
+    grupos = {}
+    erros = 0
+    for index, analise in enumerate(analises):
+        if isinstance(analise, Exception):
+            erros += 1
+            yield {"event": "error", "index": index, "detail": f"Erro ao gerar decisão: {analise}"}
+            continue
+        yield {"event": "decision", "index": index, **{campo: analise[campo] for campo in CAMPOS_DECISAO}}
+        grupos.setdefault(analise["cache_key"], []).append(index)
+
+    semaforo = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+
+    async def explicar(indices):
+        async with semaforo:
+            return indices, await gerar_explicacao(analises[indices[0]])
+
+    tarefas = [asyncio.create_task(explicar(indices)) for indices in grupos.values()]
+    try:
+        for proxima in asyncio.as_completed(tarefas):
+            indices, resultado = await proxima
+            for index in indices:
+                yield {
+                    "event": "result",
+                    "index": index,
+                    **{campo: analises[index][campo] for campo in CAMPOS_DECISAO},
+                    "explicacao_decisao": resultado["explicacao"],
+                    "ollama_time_seconds": resultado["ollama_time_seconds"],
+                }
+    finally:
+        # Cliente desconectado: não gera as explicações restantes
+        for tarefa in tarefas:
+            tarefa.cancel()
+
+    yield {
+        "event": "done",
+        "total": len(lotes),
+        "erros": erros,
+        "explicacoes_distintas": len(grupos),
+        "duration_seconds": round(time.perf_counter() - start, 3),
+    }
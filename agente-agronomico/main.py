@@ -1,23 +1,47 @@
+import json
+
 from fastapi import FastAPI, HTTPException
-from models import Requisicao, Resposta
-from utils import fetch_all_parallel, solicitar_decisao_ollama_async
+from fastapi.responses import JSONResponse, StreamingResponse
+from coalescencia import chave_requisicao, coalescedor
+from explicacao_cache import explicacao_cache
+from explicacoes import explicacao_jobs
+from lotes import BATCH_MAX_LOTES, recomendar_lotes
+from models import Requisicao, RequisicaoLotes, Resposta, RespostaRapida
+from utils import (
+    CAMPOS_DECISAO,
+    analisar_decisao,
+    consulta_rag,
+    explicacao_stream,
+    fetch_all_parallel,
+    payload_analise,
+    solicitar_decisao_ollama_async,
+)
 
 app = FastAPI(title="Agente Agronômico")
 
-@app.post("/recommend", response_model=Resposta)
-async def recommend(req: Requisicao):
-    # Construir localidade a partir de cidade e estado
-    localidade = f"{req.cidade},{req.estado}"
+@app.on_event("shutdown")
+async def shutdown_event():
+    await explicacao_jobs.shutdown()
+
+def log_fontes(rels):
+    """Loga os PDFs (fontes RAG) consultados na análise."""
+    fontes = []
+    if rels:  # Se há resultados RAG
+        fontes = list(set([
+            rel.get("metadata", {}).get("file", "Desconhecido") 
+            for rel in rels if rel.get("metadata") and rel.get("metadata").get("file")
+        ]))
     
-    # Construir query RAG
-    query_parts = [
-        f"café {req.tipo_cafe}",
-        f"região {req.cidade} {req.estado}",
-        f"colheita {req.data_colheita}",
-        f"qualidade {req.estado_cafe}",
-        "preço mercado recomendação venda"
-    ]
-    query = " ".join(query_parts)
+    # Log das fontes consultadas (não retornadas na API)
+    if fontes:
+        print(f"[RAG] PDFs utilizados na análise: {', '.join(fontes)}")
+    else:
+        print("[RAG] Nenhum PDF específico foi utilizado na análise")
+
+
+async def montar_payload(req: Requisicao) -> dict:
+    """Busca clima, preço e relatórios da requisição e monta o payload da análise."""
+    dados = req.model_dump()
     
     # Buscar dados em paralelo
     clima, preco, rels = await fetch_all_parallel(
@@ -27,21 +51,37 @@ async def recommend(req: Requisicao):
             "data_colheita": req.data_colheita,
             "tipo_cafe": req.tipo_cafe
         },
-        query
+        consulta_rag(dados)
     )
 
-    payload = {
-        "tipo_cafe": req.tipo_cafe,
-        "data_colheita": req.data_colheita,
-        "quantidade": req.quantidade,
-        "cidade": req.cidade,
-        "estado": req.estado,
-        "estado_cafe": req.estado_cafe,
-        "localidade": localidade,
-        "clima": clima,
-        "preco": preco,
-        "relatorios": rels
-    }
+    return payload_analise(dados, clima, preco, rels)
+
+
+async def analisar(req: Requisicao) -> dict:
+    """Decisão e scores da requisição, sem a explicação."""
+    payload = await montar_payload(req)
+    try:
+        analise = analisar_decisao(payload)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao gerar decisão: {str(e)}")
+    log_fontes(payload["relatorios"])
+    return analise
+
+
+async def recomendar_rapido(req: Requisicao) -> dict:
+    """Decisão imediata e job da explicação em segundo plano."""
+    analise = await analisar(req)
+    job = explicacao_jobs.start(analise)
+    return RespostaRapida(
+        **{campo: analise[campo] for campo in CAMPOS_DECISAO},
+        explicacao_job_id=job.id,
+        explicacao_status=job.status,
+    ).model_dump()
+
+
+async def recomendar(req: Requisicao) -> Resposta:
+    """Decisão e explicação completa do Ollama."""
+    payload = await montar_payload(req)
 
     # Solicitar decisão ao modelo de IA
     try:
@@ -53,27 +93,85 @@ async def recommend(req: Requisicao):
         raise HTTPException(status_code=500, detail="Falha ao gerar decisão final.")
 
     # Extrair e logar as fontes (arquivos PDF) consultadas
-    fontes = []
-    if rels:  # Se há resultados RAG
-        fontes = list(set([
-            rel.get("metadata", {}).get("file", "Desconhecido") 
-            for rel in rels if rel.get("metadata") and rel.get("metadata").get("file")
-        ]))
-    
-    # Log das fontes consultadas (não retornadas na API)
-    if fontes:
-        print(f"[RAG] PDFs utilizados na análise: {', '.join(fontes)}")
-    else:
-        print("[RAG] Nenhum PDF específico foi utilizado na análise")
+    log_fontes(payload["relatorios"])
 
     return Resposta(
         decisao=out["decisao"],
         explicacao_decisao=out.get("explicacao", ""),
     )
 
+
+@app.post("/recommend", response_model=Resposta)
+async def recommend(req: Requisicao, stream: bool = False, fast: bool = False):
+    """
+    Decisão de vender/aguardar e explicação gerada pelo Ollama.
+
+    Com `?stream=true` responde em NDJSON (ver `explicacao_stream`): a
+    decisão sai assim que a análise quantitativa termina e a explicação é
+    repassada token a token.
+
+    Com `?fast=true` devolve só a decisão e os scores, com o id do job que
+    gera a explicação em segundo plano (ver GET /recommend/explanation).
+
+    Requisições idênticas e simultâneas (mesmo modo) compartilham uma única
+    execução (ver `coalescencia`). No streaming a análise é compartilhada e
+    cada cliente recebe seu próprio stream da explicação.
+    """
+    chave = chave_requisicao(req)
+
+    if fast:
+        resposta = await coalescedor.run(("fast", chave), lambda: recomendar_rapido(req))
+        return JSONResponse(content=resposta)
+
+    if stream:
+        analise = await coalescedor.run(("stream", chave), lambda: analisar(req))
+
+        async def eventos():
+            async for evento in explicacao_stream(analise):
+                yield json.dumps(evento, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(
+            eventos(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"}
+        )
+
+    return await coalescedor.run(("completa", chave), lambda: recomendar(req))
+
+@app.post("/recommend/batch")
+async def recommend_batch(body: RequisicaoLotes):
+    """
+    Recomendação para vários lotes de uma vez, em NDJSON (ver
+    `lotes.recomendar_lotes`): clima, preço e RAG são buscados uma vez por
+    valor distinto e os resultados saem à medida que as explicações ficam
+    prontas, identificados pelo `index` do lote.
+    """
+    if len(body.lotes) > BATCH_MAX_LOTES:
+        raise HTTPException(status_code=400, detail=f"Máximo de {BATCH_MAX_LOTES} lotes por requisição")
+
+    async def eventos():
+        async for evento in recomendar_lotes([lote.model_dump() for lote in body.lotes]):
+            yield json.dumps(evento, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        eventos(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"}
+    )
+
+@app.get("/recommend/explanation/{job_id}")
+async def recommend_explanation(job_id: str, wait: float = 0):
+    """
+    Estado e resultado do job de explicação criado por `/recommend?fast=true`.
+
+    Com `?wait=<segundos>` a resposta espera o job terminar (até
+    EXPLICACAO_MAX_WAIT segundos), evitando consultas repetidas.
+    """
+    job = explicacao_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job de explicação não encontrado")
+    await explicacao_jobs.wait(job, wait)
+    return job.as_dict()
+
 @app.get("/")
 def root():
-    return {"status": "ok", "service": "agente_agronomico"}
+    return {"status": "ok", "service": "agente_agronomico", "explicacao_cache": explicacao_cache.stats(), "coalescencia": coalescedor.stats()}
 
 @app.get("/health")
 def health():
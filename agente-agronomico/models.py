@@ -11,4 +11,18 @@ class Requisicao(BaseModel):
 
 class Resposta(BaseModel):
     decisao: str
-    explicacao_decisao: str
\ No newline at end of file
+    explicacao_decisao: str
+
+class RespostaRapida(BaseModel):
+    """Resposta do modo rápido: decisão imediata e id do job da explicação."""
+    decisao: str
+    decision_score: float
+    climate_score: float
+    price_score: float
+    market_score: float
+    explicacao_job_id: str
+    explicacao_status: str
+
+class RequisicaoLotes(BaseModel):
+    """Lotes analisados em /recommend/batch."""
+    lotes: List[Requisicao] = Field(..., min_length=1)
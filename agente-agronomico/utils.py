@@ -10,11 +10,15 @@ from agronomic_agent import (
     calculate_decision_score,
     build_ai_prompt
 )
+from explicacao_cache import chave_explicacao, explicacao_cache
 
 client = httpx.AsyncClient(timeout=None)
 
 GATEWAY_URL = os.getenv("GATEWAY_URL", "http://gateway:3000")
 
+# Tipos de café com marcação nos metadados do RAG (filtro "coffee_type")
+RAG_COFFEE_TYPES = ("arabica", "robusta")
+
 # --------- CLIMA / PREÇO EM PARALELO ---------
 
 async def get_climate_async(payload: dict) -> dict:
@@ -60,17 +64,78 @@ async def get_price_async(payload: dict) -> dict:
 
 # --------- RAG ---------
 
-async def rag_search_async(query: str, k: int = 4):
+async def rag_search_async(query: str, k: int = 4, filters: dict = None, rerank: bool = False):
     """Busca semântica em relatórios técnicos"""
-    r = await client.post(f"{GATEWAY_URL}/rag/search", json={"query": query, "k": k})
+    body = {"query": query, "k": k, "rerank": rerank}
+    if filters:
+        body["filters"] = filters
+    r = await client.post(f"{GATEWAY_URL}/rag/search", json=body)
     r.raise_for_status()
     return r.json().get("results", [])
 
+
+def consulta_rag(dados: dict) -> str:
+    """Consulta RAG de uma requisição (tipo de café, região, colheita e estado do café)."""
+    query_parts = [
+        f"café {dados['tipo_cafe']}",
+        f"região {dados['cidade']} {dados['estado']}",
+        f"colheita {dados['data_colheita']}",
+        f"qualidade {dados['estado_cafe']}",
+        "preço mercado recomendação venda"
+    ]
+    return " ".join(query_parts)
+
+
+async def buscar_relatorios(query: str, tipo_cafe: str) -> list:
+    """
+    Trechos sobre o tipo de café da requisição, re-ranqueados: só os
+    primeiros entram no prompt. Sem resultados, repete sem o filtro.
+    """
+    tipo_cafe = (tipo_cafe or "").lower()
+    filters = {"coffee_type": tipo_cafe} if tipo_cafe in RAG_COFFEE_TYPES else None
+    try:
+        rels = await rag_search_async(query, k=4, filters=filters, rerank=True)
+        if not rels and filters:
+            rels = await rag_search_async(query, k=4, rerank=True)
+        return rels
+    except Exception:
+        return []
+
+
+def payload_analise(dados: dict, clima: dict, preco: dict, rels: list) -> dict:
+    """Payload da análise: dados da requisição mais clima, preço e relatórios."""
+    return {
+        "tipo_cafe": dados["tipo_cafe"],
+        "data_colheita": dados["data_colheita"],
+        "quantidade": dados["quantidade"],
+        "cidade": dados["cidade"],
+        "estado": dados["estado"],
+        "estado_cafe": dados["estado_cafe"],
+        "localidade": f"{dados['cidade']},{dados['estado']}",
+        "clima": clima,
+        "preco": preco,
+        "relatorios": rels
+    }
+
 # --------- OLLAMA ---------
 
-async def solicitar_decisao_ollama_async(payload: dict):   
+OLLAMA_MODEL = "phi3:mini"
+OLLAMA_NUM_PREDICT = 200
+
+# Campos da decisão quantitativa devolvidos junto com a explicação
+CAMPOS_DECISAO = ("decisao", "decision_score", "climate_score", "price_score", "market_score")
+
+
+def analisar_decisao(payload: dict, scores: tuple = None) -> dict:
     """
-    Solicita explicação ao modelo Ollama para a decisão tomada pelo agente
+    Análise quantitativa e decisão final do agente (sem chamar o Ollama).
+
+    `scores` (clima, preço, mercado) já calculados dispensam a análise de
+    cada componente (ver `lotes.analisar_lotes`).
+
+    Returns:
+        dict: decisao, scores de cada componente, o prompt da explicação e a
+        chave da explicação no cache
     """
     clima = payload.get("clima", {})
     preco = payload.get("preco", {})
@@ -82,9 +147,13 @@ async def solicitar_decisao_ollama_async(payload: dict):
 
     
     # Análise quantitativa usando funções do agente agronômico
-    climate_score = analyze_climate_factors(clima, tipo_cafe, estado_cafe, data_colheita)
-    price_score = analyze_price_trends(preco, quantidade, estado_cafe, data_colheita)
-    market_score = analyze_market_reports(relatorios, estado_cafe, tipo_cafe)
+    if scores is None:
+        scores = (
+            analyze_climate_factors(clima, tipo_cafe, estado_cafe, data_colheita),
+            analyze_price_trends(preco, quantidade, estado_cafe, data_colheita),
+            analyze_market_reports(relatorios, estado_cafe, tipo_cafe),
+        )
+    climate_score, price_score, market_score = scores
     
     # Calcula score final e toma a decisão final
     decision_score = calculate_decision_score(climate_score, price_score, market_score)
@@ -101,20 +170,72 @@ async def solicitar_decisao_ollama_async(payload: dict):
         decision_score, decision_final
     )
 
+    analise = {
+        "decisao": decision_final,
+        "decision_score": decision_score,
+        "climate_score": climate_score,
+        "price_score": price_score,
+        "market_score": market_score,
+        "prompt": prompt,
+    }
+    analise["cache_key"] = chave_explicacao(payload, analise, OLLAMA_MODEL)
+    return analise
+
+
+def _explicacao_padrao(analise: dict) -> str:
+    """Explicação usada quando o Ollama não responde."""
+    return (
+        f"Decisão de {analise['decisao']} baseada em análise quantitativa. "
+        f"Score final: {analise['decision_score']:.3f} (clima: {analise['climate_score']:.3f}, "
+        f"preço: {analise['price_score']:.3f}, mercado: {analise['market_score']:.3f}). Limiar para venda: 0.5"
+    )
+
+
+def _resultado(analise: dict, explicacao: str, duration=None) -> dict:
+    return {
+        "explicacao": explicacao,
+        "ollama_time_seconds": round(duration, 3) if duration is not None else None,
+        **{campo: analise[campo] for campo in CAMPOS_DECISAO},
+    }
+
+
+async def solicitar_decisao_ollama_async(payload: dict):   
+    """
+    Solicita explicação ao modelo Ollama para a decisão tomada pelo agente
+    """
+    analise = analisar_decisao(payload)
+    print(f"[CLIMA] Dados climáticos enviados ao Ollama: {payload.get('clima', {})}")
+    print(f"[PREÇO] Dados de preço enviados ao Ollama: {payload.get('preco', {})}")
+    return await gerar_explicacao(analise)
+
+
+async def gerar_explicacao(analise: dict) -> dict:
+    """
+    Gera a explicação da decisão já tomada (resposta completa do Ollama).
+    Em caso de falha devolve a explicação padrão, sem levantar exceção.
+
+    Explicações já geradas para as mesmas entradas (ver `chave_explicacao`)
+    vêm do cache, sem chamar o Ollama.
+    """
+    decision_final = analise["decisao"]
+
+    explicacao = explicacao_cache.get(analise["cache_key"])
+    if explicacao is not None:
+        print(f"[CACHE] Explicação reaproveitada para decisão: {decision_final.upper()}")
+        return _resultado(analise, explicacao, 0.0)
+
     try:
         start = time.perf_counter()
         
-        print(f"[CLIMA] Dados climáticos enviados ao Ollama: {clima}")
-        print(f"[PREÇO] Dados de preço enviados ao Ollama: {preco}")
         print(f"[OLLAMA] Solicitando explicação para decisão: {decision_final.upper()}")
         
         r = await client.post(
     f"{GATEWAY_URL}/ollama/generate",
     json={
-        "model": "phi3:mini",
-        "prompt": prompt,
+        "model": OLLAMA_MODEL,
+        "prompt": analise["prompt"],
         "stream": False,
-        "num_predict": 200,
+        "num_predict": OLLAMA_NUM_PREDICT,
     }
 )
         duration = time.perf_counter() - start
@@ -122,27 +243,88 @@ async def solicitar_decisao_ollama_async(payload: dict):
 
         explicacao = r.json().get("response", "")
         print(explicacao)
-        return {
-            "decisao": decision_final,
-            "explicacao": explicacao if explicacao else f"Decisão de {decision_final} baseada em análise quantitativa (score: {decision_score:.3f})",
-            "ollama_time_seconds": round(duration, 3),
-            "decision_score": decision_score,
-            "climate_score": climate_score,
-            "price_score": price_score,
-            "market_score": market_score
-        }
+        if explicacao:
+            explicacao_cache.set(analise["cache_key"], explicacao)
+        return _resultado(
+            analise,
+            explicacao if explicacao else f"Decisão de {decision_final} baseada em análise quantitativa (score: {analise['decision_score']:.3f})",
+            duration,
+        )
 
     except Exception as e:
         print(f"[ERROR] Erro ao consultar Ollama: {e}")
-        return {
-            "decisao": decision_final,
-            "explicacao": f"Decisão de {decision_final} baseada em análise quantitativa. Score final: {decision_score:.3f} (clima: {climate_score:.3f}, preço: {price_score:.3f}, mercado: {market_score:.3f}). Limiar para venda: 0.5",
-            "ollama_time_seconds": None,
-            "decision_score": decision_score,
-            "climate_score": climate_score,
-            "price_score": price_score,
-            "market_score": market_score
-        }
+        return _resultado(analise, _explicacao_padrao(analise))
+
+
+async def _gerar_explicacao_stream(prompt: str):
+    """Repassa os tokens da explicação à medida que o Ollama os gera."""
+    async with client.stream(
+        "POST",
+        f"{GATEWAY_URL}/ollama/generate",
+        json={
+            "model": OLLAMA_MODEL,
+            "prompt": prompt,
+            "stream": True,
+            "num_predict": OLLAMA_NUM_PREDICT,
+        },
+    ) as r:
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            if data.get("error"):
+                raise RuntimeError(data["error"])
+            if data.get("response"):
+                yield data["response"]
+            if data.get("done"):
+                break
+
+
+async def explicacao_stream(analise: dict):
+    """
+    Eventos do modo streaming de /recommend, na ordem:
+
+    - decision: decisão e scores, emitido imediatamente
+    - token: trecho da explicação, à medida que o Ollama gera
+    - done: explicação completa (ou a padrão, se o Ollama falhar antes de
+      gerar qualquer texto) e tempo de geração
+
+    Uma explicação em cache sai como um único evento token.
+    """
+    decisao = {campo: analise[campo] for campo in CAMPOS_DECISAO}
+    yield {"event": "decision", **decisao}
+
+    explicacao = explicacao_cache.get(analise["cache_key"])
+    if explicacao is not None:
+        print(f"[CACHE] Explicação reaproveitada para decisão: {analise['decisao'].upper()}")
+        yield {"event": "token", "text": explicacao}
+        yield {"event": "done", **decisao, "explicacao_decisao": explicacao, "ollama_time_seconds": 0.0, "error": None}
+        return
+
+    partes = []
+    erro = None
+    start = time.perf_counter()
+    print(f"[OLLAMA] Solicitando explicação (streaming) para decisão: {analise['decisao'].upper()}")
+    try:
+        async for token in _gerar_explicacao_stream(analise["prompt"]):
+            partes.append(token)
+            yield {"event": "token", "text": token}
+    except Exception as e:
+        erro = str(e)
+        print(f"[ERROR] Erro no streaming do Ollama: {e}")
+    duration = time.perf_counter() - start
+
+    explicacao = "".join(partes)
+    if explicacao and erro is None:
+        explicacao_cache.set(analise["cache_key"], explicacao)
+    yield {
+        "event": "done",
+        **decisao,
+        "explicacao_decisao": explicacao or _explicacao_padrao(analise),
+        "ollama_time_seconds": round(duration, 3) if explicacao else None,
+        "error": erro,
+    }
 
 # --------- BUSCA EM PARALELO ---------
 async def fetch_all_parallel(payload: dict, rag_query: str) -> tuple[dict, dict, list]:
@@ -162,16 +344,54 @@ async def fetch_all_parallel(payload: dict, rag_query: str) -> tuple[dict, dict,
         except Exception:
             return {}
     
-    async def safe_get_rag():
-        try:
-            return await rag_search_async(rag_query, k=4)
-        except Exception:
-            return []
-    
     clima, preco, rels = await asyncio.gather(
         safe_get_climate(),
         safe_get_price(),
-        safe_get_rag()
+        buscar_relatorios(rag_query, payload.get("tipo_cafe"))
     )
     
-    return clima, preco, rels
\ No newline at end of file
+    return clima, preco, rels
+
+def normalizar_campo(valor) -> str:
+    """Padroniza caixa e espaços de um campo textual (chaves de deduplicação)."""
+    return " ".join(str(valor or "").lower().split())
+
+
+async def fetch_lotes_parallel(lotes: list) -> list:
+    """
+    Busca clima, preço e RAG de vários lotes, sem repetir consultas: uma
+    previsão por cidade, uma cotação por tipo de café e uma busca RAG por
+    consulta distinta, todas em paralelo.
+    Retorna: [(clima, preco, relatorios), ...] na ordem dos lotes
+    """
+    cidades, tipos, consultas = {}, {}, {}
+    for lote in lotes:
+        cidades.setdefault((normalizar_campo(lote["cidade"]), normalizar_campo(lote["estado"])), lote)
+        tipos.setdefault(normalizar_campo(lote["tipo_cafe"]), lote)
+        consultas.setdefault(consulta_rag(lote), lote["tipo_cafe"])
+
+    async def safe(coro, default):
+        try:
+            return await coro
+        except Exception:
+            return default
+
+    resultados = await asyncio.gather(
+        *(safe(get_climate_async(lote), {}) for lote in cidades.values()),
+        *(safe(get_price_async(lote), {}) for lote in tipos.values()),
+        *(buscar_relatorios(query, tipo_cafe) for query, tipo_cafe in consultas.items()),
+    )
+    climas = dict(zip(cidades, resultados[:len(cidades)]))
+    precos = dict(zip(tipos, resultados[len(cidades):len(cidades) + len(tipos)]))
+    relatorios = dict(zip(consultas, resultados[len(cidades) + len(tipos):]))
+    print(f"[LOTES] {len(lotes)} lotes: {len(cidades)} consultas de clima, "
+          f"{len(tipos)} de preço e {len(consultas)} de RAG")
+
+    return [
+        (
+            climas[(normalizar_campo(lote["cidade"]), normalizar_campo(lote["estado"]))],
+            precos[normalizar_campo(lote["tipo_cafe"])],
+            relatorios[consulta_rag(lote)],
+        )
+        for lote in lotes
+    ]
@@ -1,6 +1,8 @@
 from fastapi import FastAPI, HTTPException
 from services.open_meteo_service import OpenMeteoService
 from models.climate_models import ClimateResponse, LocationRequest
+from utils.cache import climate_cache
+from utils.geocoding import geocoding_index
 
 app = FastAPI(
     title="Agente Climático - Cafeicultura",
@@ -10,6 +12,11 @@ app = FastAPI(
 
 service = OpenMeteoService()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await service.aclose()
+    geocoding_index.flush()
+
 @app.get("/")
 async def root():
     return {"message": "Agente Climático para Cafeicultura - Online"}
@@ -18,13 +25,30 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Estatísticas do cache de geocoding, previsão e histórico
+    """
+    return climate_cache.stats()
+
+@app.get("/geocoding/search")
+async def geocoding_search(q: str, limit: int = 10):
+    """
+    Busca por prefixo (sem acentos) nos municípios do índice local
+    """
+    return {
+        "indexed": len(geocoding_index),
+        "results": geocoding_index.search_prefix(q, limit=min(limit, 50))
+    }
+
 @app.post("/climate/forecast", response_model=ClimateResponse)
 async def get_climate_forecast(request: LocationRequest):
     """
     Retorna a previsão climática para 14 dias de uma localização
     """
     try:
-        forecast = service.get_forecast(request.location)
+        forecast = await service.get_forecast(request.location, request.extended_stats)
         return forecast
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -32,12 +56,12 @@ async def get_climate_forecast(request: LocationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/climate/forecast/{location}")
-async def get_climate_forecast_by_path(location: str):
+async def get_climate_forecast_by_path(location: str, extended_stats: bool = False):
     """
     Retorna a previsão climática para 14 dias via path parameter
     """
     try:
-        forecast = service.get_forecast(location)
+        forecast = await service.get_forecast(location, extended_stats)
         return forecast
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
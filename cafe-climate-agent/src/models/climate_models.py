@@ -22,12 +22,13 @@ class ClimateResponse(BaseModel):
     timezone: str
     elevation: Optional[float] = None
     daily_forecast: List[DailyForecast]
-    past_month_averages: Optional[Dict[str, Dict[str, float]]] = None
+    past_month_averages: Optional[Dict[str, Optional[Dict[str, Optional[float]]]]] = None
     generated_time: str
 
 
 class LocationRequest(BaseModel):
     location: str = Field(..., min_length=1, max_length=100)
+    extended_stats: bool = False
 
     @validator("location")
     def sanitize_location(cls, value: str):
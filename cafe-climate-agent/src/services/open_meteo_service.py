@@ -1,19 +1,57 @@
-import requests
-from datetime import datetime, timedelta
+import asyncio
+import warnings
+import httpx
+import numpy as np
+from datetime import date, datetime, timedelta
+from typing import List, Tuple
 from models.climate_models import ClimateResponse, DailyForecast, LocationRequest
-from utils.geocoding import get_coordinates
+from utils.geocoding import get_coordinates, normalize_name
+from utils.cache import climate_cache, coord_key, FORECAST_TTL, ARCHIVE_TTL, GEOCODING_TTL
+
+# Variáveis diárias do histórico, pelo prefixo usado nas chaves da resposta
+ARCHIVE_VARIABLES = {
+    "temperature_max": "temperature_2m_max",
+    "temperature_min": "temperature_2m_min",
+    "precipitation": "precipitation_sum",
+    "windspeed_max": "windspeed_10m_max",
+}
+ARCHIVE_MONTHS_BACK = [1, 2, 3]
+# Precipitação mínima (mm) para contar um dia como chuvoso
+RAINY_DAY_MM = 1.0
 
 class OpenMeteoService:
-    def __init__(self):
+    def __init__(self, cache=climate_cache):
         self.forecast_url = "https://api.open-meteo.com/v1/forecast"
         self.archive_url = "https://archive-api.open-meteo.com/v1/archive"
-
-    def get_forecast(self, location: str) -> ClimateResponse:
+        self.cache = cache
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Cliente HTTP assíncrono compartilhado (pool de conexões keep-alive)."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=30.0,
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=10)
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_forecast(self, location: str, extended_stats: bool = False) -> ClimateResponse:
         # Sanitização executada pelo Pydantic
         sanitized = LocationRequest(location=location)
         clean_location = sanitized.location
 
-        geo_data = get_coordinates(clean_location)
+        # Geocoding síncrono (índice local ou API) roda fora do event loop
+        geo_data = await self.cache.get_or_load(
+            f"geocode:{normalize_name(clean_location)}",
+            GEOCODING_TTL,
+            lambda: asyncio.to_thread(get_coordinates, clean_location)
+        )
         latitude, longitude = geo_data["latitude"], geo_data["longitude"]
 
         # ===== 1. PREVISÃO (14 dias) =====
@@ -33,46 +71,36 @@ class OpenMeteoService:
             "forecast_days": 14
         }
 
-        try:
-            response = requests.get(self.forecast_url, params=forecast_params)
-            response.raise_for_status()
-            forecast_data = response.json()
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Erro ao consultar previsão: {str(e)}")
-
-        forecasts = self._parse_forecast(forecast_data)
+        forecast_task = self.cache.get_or_load(
+            coord_key("forecast", latitude, longitude),
+            FORECAST_TTL,
+            lambda: self._fetch(self.forecast_url, forecast_params, "previsão")
+        )
 
         # ===== 2. HISTÓRICO (1, 2 e 3 meses atrás) =====
-        now = datetime.utcnow()
-        averages = {}
+        # Uma única consulta cobre todas as janelas; as médias são calculadas localmente
+        windows = self._archive_windows(datetime.utcnow())
+        archive_params = {
+            "latitude": latitude,
+            "longitude": longitude,
+            "start_date": min(w[1] for w in windows).strftime("%Y-%m-%d"),
+            "end_date": max(w[2] for w in windows).strftime("%Y-%m-%d"),
+            "timezone": geo_data["timezone"],
+            "daily": list(ARCHIVE_VARIABLES.values())
+        }
 
-        for months_back in [1, 2, 3]:
-            ref_date = now.replace(day=1) - timedelta(days=(months_back * 30))
-            start_date = ref_date.replace(day=1)
-            end_date = (start_date + timedelta(days=30))
-
-            archive_params = {
-                "latitude": latitude,
-                "longitude": longitude,
-                "start_date": start_date.strftime("%Y-%m-%d"),
-                "end_date": end_date.strftime("%Y-%m-%d"),
-                "timezone": geo_data["timezone"],
-                "daily": [
-                    "temperature_2m_max",
-                    "temperature_2m_min",
-                    "precipitation_sum",
-                    "windspeed_10m_max"
-                ]
-            }
+        archive_task = self.cache.get_or_load(
+            coord_key("archive", latitude, longitude,
+                      archive_params["start_date"], archive_params["end_date"]),
+            ARCHIVE_TTL,
+            lambda: self._fetch(self.archive_url, archive_params, "histórico")
+        )
 
-            try:
-                archive_response = requests.get(self.archive_url, params=archive_params)
-                archive_response.raise_for_status()
-                archive_data = archive_response.json()
-            except requests.exceptions.RequestException as e:
-                raise Exception(f"Erro ao consultar histórico: {str(e)}")
+        # Previsão e histórico são buscados em paralelo
+        forecast_data, archive_data = await asyncio.gather(forecast_task, archive_task)
 
-            averages[f"{months_back}_mes_atras"] = self._compute_monthly_average(archive_data)
+        forecasts = self._parse_forecast(forecast_data)
+        averages = self._compute_window_stats(archive_data, windows, extended_stats)
 
         # ===== 3. RETORNO FINAL =====
         return ClimateResponse(
@@ -86,6 +114,14 @@ class OpenMeteoService:
             generated_time=datetime.utcnow().isoformat()
         )
 
+    async def _fetch(self, url: str, params: dict, label: str) -> dict:
+        try:
+            response = await self.client.get(url, params=params)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            raise Exception(f"Erro ao consultar {label}: {str(e)}")
+
     def _parse_forecast(self, data: dict):
         daily = data["daily"]
         forecasts = []
@@ -103,19 +139,80 @@ class OpenMeteoService:
             ))
         return forecasts
 
-    def _compute_monthly_average(self, data: dict):
+    @staticmethod
+    def _archive_windows(now: datetime) -> List[Tuple[str, date, date]]:
+        """Janelas (rótulo, início, fim) do mês atual há 1, 2 e 3 meses atrás."""
+        windows = []
+        for months_back in ARCHIVE_MONTHS_BACK:
+            ref_date = now.replace(day=1) - timedelta(days=(months_back * 30))
+            start_date = ref_date.replace(day=1).date()
+            end_date = start_date + timedelta(days=30)
+            windows.append((f"{months_back}_mes_atras", start_date, end_date))
+        return windows
+
+    def _compute_window_stats(self, data: dict, windows: List[Tuple[str, date, date]], extended: bool = False):
+        """
+        Agrega o histórico diário em todas as janelas de uma vez.
+
+        As colunas viram uma matriz (variável x dia) e as janelas uma máscara
+        (janela x dia); médias e estatísticas extras saem de um único cálculo
+        vetorizado sobre a combinação das duas.
+        """
         daily = data.get("daily", {})
-        n = len(daily.get("time", []))
+        times = daily.get("time", [])
+        n = len(times)
         if n == 0:
-            return None
-
-        def avg(values):
-            valid = [v for v in values if v is not None]
-            return sum(valid) / len(valid) if valid else None
-
-        return {
-            "temperature_max_avg": avg(daily.get("temperature_2m_max", [])),
-            "temperature_min_avg": avg(daily.get("temperature_2m_min", [])),
-            "precipitation_avg": avg(daily.get("precipitation_sum", [])),
-            "windspeed_max_avg": avg(daily.get("windspeed_10m_max", []))
-        }
+            return {label: None for label, _, _ in windows}
+
+        dates = np.array(times, dtype="datetime64[D]")
+        starts = np.array([w[1] for w in windows], dtype="datetime64[D]")
+        ends = np.array([w[2] for w in windows], dtype="datetime64[D]")
+        in_window = (dates >= starts[:, None]) & (dates <= ends[:, None])  # (janelas, dias)
+
+        # None vira NaN na conversão para float
+        columns = np.array(
+            [daily.get(var) or [None] * n for var in ARCHIVE_VARIABLES.values()],
+            dtype=float
+        )  # (variáveis, dias)
+        values = np.where(in_window[:, None, :], columns[None, :, :], np.nan)  # (janelas, variáveis, dias)
+
+        valid = ~np.isnan(values)
+        counts = valid.sum(axis=2)
+        sums = np.where(valid, values, 0.0).sum(axis=2)
+        means = np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+
+        if extended:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                mins = np.nanmin(values, axis=2)
+                maxs = np.nanmax(values, axis=2)
+                p50, p90 = np.nanpercentile(values, [50, 90], axis=2)
+            precip = values[:, list(ARCHIVE_VARIABLES).index("precipitation"), :]
+            rainy_days = (precip >= RAINY_DAY_MM).sum(axis=1)
+            precip_total = np.nansum(precip, axis=1)
+
+        def to_float(value):
+            return None if np.isnan(value) else float(value)
+
+        result = {}
+        for w, (label, _, _) in enumerate(windows):
+            if not in_window[w].any():
+                result[label] = None
+                continue
+
+            stats = {
+                f"{name}_avg": to_float(means[w, v])
+                for v, name in enumerate(ARCHIVE_VARIABLES)
+            }
+            if extended:
+                for v, name in enumerate(ARCHIVE_VARIABLES):
+                    stats[f"{name}_min"] = to_float(mins[w, v])
+                    stats[f"{name}_max"] = to_float(maxs[w, v])
+                    stats[f"{name}_p50"] = to_float(p50[w, v])
+                    stats[f"{name}_p90"] = to_float(p90[w, v])
+                stats["precipitation_total"] = float(precip_total[w])
+                stats["rainy_days"] = int(rainy_days[w])
+                stats["days"] = int(in_window[w].sum())
+            result[label] = stats
+
+        return result
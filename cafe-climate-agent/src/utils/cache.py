@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# TTLs por tipo de dado (segundos)
+FORECAST_TTL = int(os.getenv("FORECAST_CACHE_TTL", "3600"))
+ARCHIVE_TTL = int(os.getenv("ARCHIVE_CACHE_TTL", "86400"))
+GEOCODING_TTL = int(os.getenv("GEOCODING_CACHE_TTL", "2592000"))
+
+CACHE_MAX_ENTRIES = int(os.getenv("CLIMATE_CACHE_MAX_ENTRIES", "1024"))
+# Diretório do cache em disco; vazio desativa a camada persistente
+CACHE_DIR = os.getenv("CLIMATE_CACHE_DIR", "")
+
+# Casas decimais usadas para arredondar coordenadas nas chaves (~1 km)
+COORD_PRECISION = 2
+
+
+def coord_key(prefix: str, latitude: float, longitude: float, *parts: str) -> str:
+    """Monta a chave de cache a partir das coordenadas arredondadas."""
+    lat = round(float(latitude), COORD_PRECISION)
+    lon = round(float(longitude), COORD_PRECISION)
+    return ":".join([prefix, f"{lat:.{COORD_PRECISION}f}", f"{lon:.{COORD_PRECISION}f}", *parts])
+
+
+class TTLCache:
+    """
+    Cache LRU em memória com expiração por entrada e camada opcional em disco.
+
+    `get_or_load` garante single-flight: chamadas simultâneas para a mesma
+    chave aguardam uma única execução do loader.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, disk_dir: str = CACHE_DIR):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir or None
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    # ---------- camada em disco ----------
+
+    def _disk_path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.json")
+
+    def _disk_get(self, key: str) -> Optional[tuple]:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("key") != key or entry.get("expires_at", 0) <= time.time():
+            return None
+        return entry["expires_at"], entry["value"]
+
+    def _disk_set(self, key: str, expires_at: float, value: Any):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "expires_at": expires_at, "value": value}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            print(f"[CACHE] Falha ao gravar cache em disco: {e}")
+
+    # ---------- API ----------
+
+    def get(self, key: str) -> Optional[Any]:
+        """Retorna o valor em cache ou None se ausente/expirado."""
+        value = self._lookup(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def _lookup(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                del self._entries[key]
+
+        entry = self._disk_get(key)
+        if entry is None:
+            return None
+        with self._lock:
+            self._store(key, entry[0], entry[1])
+        return entry[1]
+
+    def set(self, key: str, value: Any, ttl: float):
+        """Armazena o valor com tempo de vida `ttl` em segundos."""
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._store(key, expires_at, value)
+        self._disk_set(key, expires_at, value)
+
+    def _store(self, key: str, expires_at: float, value: Any):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_load(self, key: str, ttl: float, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Retorna o valor em cache ou executa `loader` uma única vez por chave,
+        mesmo com várias requisições simultâneas.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, ttl, loader))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # shield: o cancelamento de uma requisição não cancela a carga compartilhada
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, ttl: float, loader: Callable[[], Awaitable[Any]]) -> Any:
+        self.loads += 1
+        value = await loader()
+        self.set(key, value, ttl)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_enabled": bool(self.disk_dir),
+                "hits": self.hits,
+                "misses": self.misses,
+                "upstream_loads": self.loads,
+                "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+climate_cache = TTLCache()
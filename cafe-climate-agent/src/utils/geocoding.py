@@ -1,6 +1,36 @@
+import bisect
+import csv
+import json
+import os
+import re
+import tempfile
+import threading
+import time
 import requests
 import unicodedata
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
+
+# Arquivo JSON onde o índice local é persistido (vazio = apenas memória)
+GEOCODING_INDEX_PATH = os.getenv("GEOCODING_INDEX_PATH", "")
+# CSV de municípios carregado em lote no startup (opcional)
+GEOCODING_MUNICIPIOS_FILE = os.getenv("GEOCODING_MUNICIPIOS_FILE", "")
+# Tempo (segundos) que um nome não encontrado fica no cache negativo
+GEOCODING_NEGATIVE_TTL = int(os.getenv("GEOCODING_NEGATIVE_TTL", "3600"))
+# Atraso (segundos) da gravação do índice após uma inclusão: as inclusões
+# nesse intervalo são gravadas juntas (0 = grava a cada inclusão)
+GEOCODING_SAVE_DELAY = float(os.getenv("GEOCODING_SAVE_DELAY", "5"))
+
+# Códigos IBGE das unidades federativas
+CODIGOS_UF = {
+    "11": "ro", "12": "ac", "13": "am", "14": "rr", "15": "pa", "16": "ap", "17": "to",
+    "21": "ma", "22": "pi", "23": "ce", "24": "rn", "25": "pb", "26": "pe", "27": "al",
+    "28": "se", "29": "ba", "31": "mg", "32": "es", "33": "rj", "35": "sp", "41": "pr",
+    "42": "sc", "43": "rs", "50": "ms", "51": "mt", "52": "go", "53": "df",
+}
+UFS = set(CODIGOS_UF.values())
+
+_LOCATION_UF_RE = re.compile(r"^(.*?)[\s,\-/]+([a-z]{2})$")
+
 
 def normalize_name(name: str) -> str:
     """Remove acentos e padroniza o nome da cidade"""
@@ -10,11 +40,217 @@ def normalize_name(name: str) -> str:
         if unicodedata.category(c) != "Mn"
     )
 
+
+def split_location(location_name: str) -> Tuple[str, str]:
+    """
+    Separa "Cidade,UF" / "Cidade-UF" em (cidade, uf) normalizados.
+    Retorna uf vazia quando a sigla não é informada.
+    """
+    normalized = normalize_name(location_name)
+    match = _LOCATION_UF_RE.match(normalized)
+    if match and match.group(2) in UFS:
+        return match.group(1).strip(" ,-"), match.group(2)
+    return normalized.strip(" ,-"), ""
+
+
+class GeocodingIndex:
+    """
+    Índice local de municípios brasileiros, chaveado por "cidade|uf" normalizado.
+
+    É alimentado sob demanda pelas consultas à API e pode ser carregado em lote
+    a partir de um CSV de municípios. Nomes não encontrados ficam num cache
+    negativo para evitar novas consultas repetidas à API.
+    """
+
+    def __init__(
+        self,
+        path: str = GEOCODING_INDEX_PATH,
+        negative_ttl: int = GEOCODING_NEGATIVE_TTL,
+        save_delay: float = GEOCODING_SAVE_DELAY,
+    ):
+        self.path = path or None
+        self.negative_ttl = negative_ttl
+        self.save_delay = save_delay
+        self._entries: Dict[str, dict] = {}
+        self._sorted_keys: List[str] = []
+        self._negative: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        # Serializa as gravações: a última a terminar tem o retrato mais recente
+        self._save_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+                self._sorted_keys = sorted(self._entries)
+            except (OSError, ValueError) as e:
+                print(f"[GEOCODING] Falha ao carregar índice local: {e}")
+
+    @staticmethod
+    def make_key(city: str, uf: str = "") -> str:
+        return f"{city}|{uf}"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, city: str, uf: str = "") -> Optional[dict]:
+        """Busca exata por cidade (e UF, se informada)."""
+        entry = self._entries.get(self.make_key(city, uf))
+        if entry is not None or uf:
+            return entry
+        # Sem UF: aceita qualquer município com o mesmo nome
+        matches = self.search_prefix(f"{city}|", limit=1)
+        return matches[0] if matches else None
+
+    def search_prefix(self, prefix: str, limit: int = 10) -> List[dict]:
+        """Retorna municípios cuja chave normalizada começa com `prefix`."""
+        prefix = normalize_name(prefix)
+        keys = self._sorted_keys
+        start = bisect.bisect_left(keys, prefix)
+        results = []
+        for key in keys[start:]:
+            if not key.startswith(prefix) or len(results) >= limit:
+                break
+            results.append(self._entries[key])
+        return results
+
+    def add(self, city: str, uf: str, data: dict, persist: bool = True):
+        key = self.make_key(city, uf)
+        with self._lock:
+            if key not in self._entries:
+                bisect.insort(self._sorted_keys, key)
+            self._entries[key] = data
+            self._negative.pop(key, None)
+        if persist:
+            self._schedule_save()
+
+    def _schedule_save(self):
+        """Agenda a gravação do índice, agrupando as inclusões do intervalo."""
+        if not self.path:
+            return
+        if self.save_delay <= 0:
+            self.save()
+            return
+        with self._lock:
+            if self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Grava agora as inclusões pendentes (chamado também no shutdown)."""
+        with self._lock:
+            timer, self._save_timer = self._save_timer, None
+        if timer is not None:
+            timer.cancel()
+            self.save()
+
+    def is_known_missing(self, city: str, uf: str = "") -> bool:
+        key = self.make_key(city, uf)
+        expires_at = self._negative.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            self._negative.pop(key, None)
+            return False
+        return True
+
+    def mark_missing(self, city: str, uf: str = ""):
+        self._negative[self.make_key(city, uf)] = time.time() + self.negative_ttl
+
+    def save(self):
+        """Grava o índice em disco de forma atômica."""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                snapshot = dict(self._entries)
+            try:
+                # Nome temporário único: gravações simultâneas não se misturam
+                descritor, tmp_path = tempfile.mkstemp(
+                    dir=os.path.dirname(os.path.abspath(self.path)),
+                    prefix=f"{os.path.basename(self.path)}.",
+                    suffix=".tmp",
+                )
+            except OSError as e:
+                print(f"[GEOCODING] Falha ao salvar índice local: {e}")
+                return
+            try:
+                with os.fdopen(descritor, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                os.unlink(tmp_path)
+                print(f"[GEOCODING] Falha ao salvar índice local: {e}")
+
+    def load_municipios_csv(self, csv_path: str) -> int:
+        """
+        Carrega municípios em lote a partir de um CSV.
+
+        Colunas aceitas: nome, uf (ou codigo_uf do IBGE), latitude, longitude
+        e, opcionalmente, timezone/fuso_horario e elevation.
+        """
+        count = 0
+        with open(csv_path, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                uf = (row.get("uf") or CODIGOS_UF.get(row.get("codigo_uf", ""), "")).lower()
+                if not row.get("nome") or not uf:
+                    continue
+                self.add(normalize_name(row["nome"]), uf, {
+                    "latitude": float(row["latitude"]),
+                    "longitude": float(row["longitude"]),
+                    "timezone": row.get("timezone") or row.get("fuso_horario") or "America/Sao_Paulo",
+                    "elevation": float(row.get("elevation") or 0),
+                    "name": row["nome"],
+                    "country": "Brazil",
+                }, persist=False)
+                count += 1
+        self.save()
+        print(f"[GEOCODING] {count} municípios carregados de {csv_path}")
+        return count
+
+
+geocoding_index = GeocodingIndex()
+
+if GEOCODING_MUNICIPIOS_FILE:
+    try:
+        geocoding_index.load_municipios_csv(GEOCODING_MUNICIPIOS_FILE)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[GEOCODING] Falha ao carregar municípios: {e}")
+
+
 def get_coordinates(location_name: str) -> Dict[str, float | str]:
     """
     Converte nome de cidade em coordenadas, retornando *somente cidades do Brasil*.
-    Agora utiliza o parâmetro 'country=BR' da própria API Open-Meteo.
+    Consulta primeiro o índice local; a API Open-Meteo (com 'country=BR')
+    só é chamada para municípios ainda não indexados.
     """
+    city, uf = split_location(location_name)
+
+    cached = geocoding_index.lookup(city, uf)
+    if cached is not None:
+        return cached
+
+    if geocoding_index.is_known_missing(city, uf):
+        raise ValueError(
+            f"A localização '{location_name}' não foi encontrada no Brasil."
+        )
+
+    result = _fetch_coordinates(location_name)
+    if result is None:
+        geocoding_index.mark_missing(city, uf)
+        raise ValueError(
+            f"A localização '{location_name}' não foi encontrada no Brasil."
+        )
+
+    geocoding_index.add(city, uf, result)
+    return result
+
+
+def _fetch_coordinates(location_name: str) -> Optional[Dict[str, float | str]]:
+    """Consulta a API de geocoding da Open-Meteo."""
     normalized_name = normalize_name(location_name)
 
     url = "https://geocoding-api.open-meteo.com/v1/search"
@@ -71,6 +307,4 @@ def get_coordinates(location_name: str) -> Dict[str, float | str]:
                 raise Exception(f"Erro ao buscar coordenadas: {e}")
             continue
 
-    raise ValueError(
-        f"A localização '{location_name}' não foi encontrada no Brasil."
-    )
+    return None
@@ -3,7 +3,7 @@
  * 
  * Formulário para análise com IA + resultados
  * 
- * APIs: /agro/recommend (POST), /analises (POST)
+ * APIs: /agro/recommend?stream=true (POST, NDJSON), /analises (POST)
  * Validações: campos obrigatórios, formato
  * Estados: análise em andamento, salvamento
  */
@@ -91,7 +91,9 @@ const NewAnalysis: React.FC = () => {
         estado_cafe: formData.estado_cafe
       };
 
-      const response = await fetch(`${API_BASE}/agro/recommend`, {
+      // Modo streaming: a decisão chega assim que fica pronta e a
+      // explicação da IA vai sendo exibida conforme é gerada
+      const response = await fetch(`${API_BASE}/agro/recommend?stream=true`, {
         method: 'POST',
         headers: {
           'Authorization': `Bearer ${token}`,
@@ -120,8 +122,33 @@ const NewAnalysis: React.FC = () => {
         }
       }
 
-      const analysisResult = await response.json();
-      setAnalysisResult(analysisResult);
+      const reader = response.body!.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let decisao = '';
+      let explicacao = '';
+
+      const handleEvent = (event: any) => {
+        if (event.event === 'decision') {
+          decisao = event.decisao;
+        } else if (event.event === 'token') {
+          explicacao += event.text;
+        } else if (event.event === 'done') {
+          explicacao = event.explicacao_decisao;
+        }
+        setAnalysisResult({ decisao, explicacao_decisao: explicacao });
+      };
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop() ?? '';
+        lines.filter(line => line.trim()).forEach(line => handleEvent(JSON.parse(line)));
+      }
+      if (buffer.trim()) handleEvent(JSON.parse(buffer));
+
       showNotification('success', 'Análise agronômica concluída com sucesso!');
 
     } catch (error) {
@@ -397,7 +424,7 @@ const NewAnalysis: React.FC = () => {
 
               <div className={styles.resultsPanel}>
                 <div className={styles.resultsContent}>
-                  {isAnalyzing ? (
+                  {isAnalyzing && !analysisResult ? (
                     <div className={styles.loadingState}>
                       <div className={styles.loadingSpinner}></div>
                       <h3 className={styles.loadingTitle}>Analisando dados...</h3>
@@ -425,7 +452,7 @@ const NewAnalysis: React.FC = () => {
                           className={styles.saveButton}
                           type="button"
                           onClick={handleSaveAnalysis}
-                          disabled={isSaving}
+                          disabled={isSaving || isAnalyzing}
                         >
                           {isSaving ? (
                             <>
@@ -1,10 +1,26 @@
+import asyncio
 from fastapi import FastAPI
 from app.routes.price import router as price_router
+from app.services.armazenamento import armazenamento
 
 app = FastAPI(title="Cafe Price Agent")
 
 app.include_router(price_router)
 
+_agendador = None
+
+@app.on_event("startup")
+async def iniciar_agendador():
+    """Inicia a atualização periódica das séries de preço em segundo plano."""
+    global _agendador
+    _agendador = asyncio.create_task(armazenamento.executar_agendador())
+
+@app.on_event("shutdown")
+async def parar_agendador():
+    if _agendador is not None:
+        _agendador.cancel()
+    armazenamento.encerrar()
+
 @app.get("/")
 def read_root():
     """
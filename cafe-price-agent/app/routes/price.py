@@ -1,16 +1,46 @@
 from fastapi import APIRouter, HTTPException
-import os
-from app.services.scraper import baixar_cepea, ler_xls_para_csv
-from app.services.processor import processar_dados
-from app.utils.calc import calcular_medias_moveis, calcular_desvio_padrao_10_dias
+import asyncio
+import numpy as np
+from app.services.armazenamento import armazenamento
+from app.utils.calc import (
+    calcular_medias_moveis, calcular_desvio_padrao_10_dias,
+    calcular_estatisticas, para_arrays, formatar_datas
+)
 
 router = APIRouter()
 
+# Estatísticas calculadas por tipo de café, reaproveitadas enquanto a série não muda
+_respostas_cache = {}
+
+async def _garantir_dados(tipo_cafe: str):
+    """
+    Consulta o CEPEA na requisição quando ainda não existe nenhum dado para
+    o tipo (startup frio ou réplica ainda não atualizada).
+
+    Raises:
+        HTTPException: 504 se o CEPEA não responder a tempo, 500 para outros erros
+    """
+    if armazenamento.possui_dados(tipo_cafe):
+        return
+    try:
+        await armazenamento.atualizar_async(tipo_cafe)
+    except asyncio.TimeoutError:
+        armazenamento.registrar_falha(tipo_cafe, "tempo esgotado")
+        raise HTTPException(status_code=504, detail="Tempo esgotado ao consultar o CEPEA")
+    except Exception as e:
+        armazenamento.registrar_falha(tipo_cafe, e)
+        raise HTTPException(status_code=500, detail=f"Erro no processamento: {str(e)}")
+
+
 @router.get("/preco/{tipo_cafe}")
 async def obter_preco_cafe(tipo_cafe: str):
     """
     Endpoint REST para obter preços atualizados e médias móveis do café.
     
+    Os dados vêm da série mantida em memória pelo armazenamento de preços,
+    atualizada em segundo plano. O CEPEA só é consultado na requisição
+    quando ainda não existe nenhum dado para o tipo solicitado.
+    
     Args:
         tipo_cafe (str): Tipo de café ('arabica' ou 'robusta')
         
@@ -20,6 +50,7 @@ async def obter_preco_cafe(tipo_cafe: str):
             - data_mais_recente: Data do último preço disponível
             - preco_atual: Preço mais recente
             - medias_moveis_3_dias: Lista de médias móveis calculadas
+            - atualizacao: Metadados de atualização da série
             
     Raises:
         HTTPException: 400 para tipo inválido, 404 para dados não encontrados,
@@ -28,47 +59,89 @@ async def obter_preco_cafe(tipo_cafe: str):
     if tipo_cafe not in ["arabica", "robusta"]:
         raise HTTPException(status_code=400, detail="Tipo de café deve ser 'arabica' ou 'robusta'")
     
-    nome_xls = None
-    nome_csv = f"cepea_dados_{tipo_cafe}.csv"
-    
-    try:
-        
-        nome_xls = baixar_cepea(tipo_cafe)
-        ler_xls_para_csv(nome_xls, nome_csv)
+    await _garantir_dados(tipo_cafe)
+
+    versao = armazenamento.versao[tipo_cafe]
+    cache = _respostas_cache.get(tipo_cafe)
 
-        dados_processados = processar_dados(nome_csv)
+    if cache is None or cache[0] != versao:
+        dados_processados = armazenamento.obter_dados(tipo_cafe)
 
         if not dados_processados:
             raise HTTPException(status_code=404, detail="Nenhum dado encontrado para o período")
 
-        dados_90_dias = dados_processados[:90]
+        try:
+            dados_90_dias = dados_processados[:90]
 
-        medias = calcular_medias_moveis(dados_90_dias)
-        desvios = calcular_desvio_padrao_10_dias(dados_90_dias)
+            medias = calcular_medias_moveis(dados_90_dias)
+            desvios = calcular_desvio_padrao_10_dias(dados_90_dias)
 
-        resposta = {
-            "tipo_cafe": tipo_cafe,
-            "dias_analisados": len(dados_90_dias),
-            "data_mais_recente": dados_90_dias[0]['data'].strftime('%d/%m/%Y'),
-            "preco_atual": dados_90_dias[0]['preco'],
-            "desvio_padrao_10_dias": desvios, 
-            "medias_moveis_3_dias": medias
-        }
-        
-        return resposta 
-        
-    except Exception as e:
+            resposta = {
+                "tipo_cafe": tipo_cafe,
+                "dias_analisados": len(dados_90_dias),
+                "data_mais_recente": dados_90_dias[0]['data'].strftime('%d/%m/%Y'),
+                "preco_atual": dados_90_dias[0]['preco'],
+                "desvio_padrao_10_dias": desvios, 
+                "medias_moveis_3_dias": medias
+            }
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro no processamento: {str(e)}")
 
-        raise HTTPException(status_code=500, detail=f"Erro no processamento: {str(e)}")
+        cache = (versao, resposta)
+        _respostas_cache[tipo_cafe] = cache
+
+    return {**cache[1], "atualizacao": armazenamento.status(tipo_cafe)}
+
+
+@router.get("/preco/{tipo_cafe}/estatisticas")
+async def obter_estatisticas_cafe(tipo_cafe: str, dias: int = 90, janela: int = 3, span: int = 10, horizonte: int = 1):
+    """
+    Endpoint REST com estatísticas móveis diárias da série de preços.
     
-    finally:
+    Args:
+        tipo_cafe (str): Tipo de café ('arabica' ou 'robusta')
+        dias (int): Quantidade de dias mais recentes analisados
+        janela (int): Janela da média móvel, desvio móvel e z-score
+        span (int): Span da média móvel exponencial (EWMA)
+        horizonte (int): Horizonte, em dias, do retorno
+        
+    Returns:
+        dict: Série diária com preço, média móvel, desvio móvel, EWMA,
+              retorno e z-score (null quando não há histórico suficiente)
+              
+    Raises:
+        HTTPException: 400 para parâmetros inválidos, 404 para dados não encontrados,
+                      504/500 quando a consulta inicial ao CEPEA falha
+    """
+    if tipo_cafe not in ["arabica", "robusta"]:
+        raise HTTPException(status_code=400, detail="Tipo de café deve ser 'arabica' ou 'robusta'")
 
-        try:
+    if dias < 2 or not (1 <= janela <= dias) or span < 1 or not (1 <= horizonte < dias):
+        raise HTTPException(status_code=400, detail="Parâmetros inválidos: use 1 <= janela <= dias, 1 <= horizonte < dias e span >= 1")
 
-            if nome_xls and os.path.exists(nome_xls):
-                os.remove(nome_xls)
+    await _garantir_dados(tipo_cafe)
 
-            if nome_csv and os.path.exists(nome_csv):
-                os.remove(nome_csv)
-        except Exception as e:
-            print(f"Aviso: Erro na limpeza dos arquivos: {e}")
+    dados = armazenamento.obter_dados(tipo_cafe)[:dias]
+    if not dados:
+        raise HTTPException(status_code=404, detail="Nenhum dado encontrado para o período")
+
+    datas, precos = para_arrays(dados)
+    estatisticas = calcular_estatisticas(precos, janela=janela, span=span, horizonte=horizonte)
+
+    def valor(x):
+        return None if np.isnan(x) else round(float(x), 4)
+
+    return {
+        "tipo_cafe": tipo_cafe,
+        "dias_analisados": len(precos),
+        "parametros": {"janela": janela, "span": span, "horizonte": horizonte},
+        "serie": [
+            {
+                "data": data,
+                "preco": float(preco),
+                **{nome: valor(valores[i]) for nome, valores in estatisticas.items()}
+            }
+            for i, (data, preco) in enumerate(zip(formatar_datas(datas), precos))
+        ],
+        "atualizacao": armazenamento.status(tipo_cafe)
+    }
@@ -0,0 +1,274 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+from app.services.scraper import baixar_cepea
+from app.services.processor import processar_xls
+
+TIPOS_CAFE = ["arabica", "robusta"]
+
+# Diretório onde as séries de preço são persistidas entre reinícios
+PRICE_STORE_DIR = os.getenv("PRICE_STORE_DIR", "./data")
+# Intervalo (segundos) entre atualizações em segundo plano
+PRICE_REFRESH_INTERVAL = int(os.getenv("PRICE_REFRESH_INTERVAL", "21600"))
+# Quantidade máxima de registros diários mantidos por tipo de café
+PRICE_STORE_MAX_REGISTROS = int(os.getenv("PRICE_STORE_MAX_REGISTROS", "1000"))
+# Threads dedicadas ao scraping/parse (fora do event loop)
+PRICE_SCRAPER_WORKERS = int(os.getenv("PRICE_SCRAPER_WORKERS", "2"))
+# Tempo máximo (segundos) de uma atualização completa
+PRICE_SCRAPE_TIMEOUT = float(os.getenv("PRICE_SCRAPE_TIMEOUT", "90"))
+
+
+class AtualizacaoCancelada(Exception):
+    """A atualização foi cancelada (ex: tempo esgotado) antes de ser aplicada."""
+
+
+class ArmazenamentoPrecos:
+    """
+    Mantém em memória a série de preços do CEPEA de cada tipo de café.
+
+    A série é persistida em disco e atualizada de forma incremental: cada
+    atualização baixa apenas as datas posteriores ao registro mais recente.
+    Várias réplicas podem compartilhar o mesmo diretório: a atualização é
+    serializada por uma trava de arquivo e cada réplica recarrega a série
+    gravada por outra antes de consultar o CEPEA.
+    """
+
+    def __init__(self, diretorio=PRICE_STORE_DIR, max_registros=PRICE_STORE_MAX_REGISTROS):
+        self.diretorio = diretorio
+        self.max_registros = max_registros
+        self._series = {}
+        self._atualizado_em = {}
+        self._ultima_falha = {}
+        self._mtime = {}
+        self.versao = {tipo: 0 for tipo in TIPOS_CAFE}
+        self._locks = {tipo: threading.Lock() for tipo in TIPOS_CAFE}
+        self._executor = ThreadPoolExecutor(max_workers=PRICE_SCRAPER_WORKERS, thread_name_prefix="cepea")
+        self._em_andamento = {}
+
+        for tipo in TIPOS_CAFE:
+            self._carregar(tipo)
+
+    def _caminho(self, tipo_cafe):
+        return os.path.join(self.diretorio, f"precos_{tipo_cafe}.json")
+
+    @contextmanager
+    def _trava_arquivo(self, tipo_cafe):
+        """Trava exclusiva entre processos/réplicas que usam o mesmo diretório."""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.diretorio, exist_ok=True)
+        with open(os.path.join(self.diretorio, f"precos_{tipo_cafe}.lock"), "a") as trava:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def _carregar(self, tipo_cafe):
+        """Carrega a série persistida em disco, se existir."""
+        caminho = self._caminho(tipo_cafe)
+        if not os.path.exists(caminho):
+            return
+        try:
+            mtime = os.stat(caminho).st_mtime_ns
+            with open(caminho, "r", encoding="utf-8") as f:
+                conteudo = json.load(f)
+            self._series[tipo_cafe] = [
+                {"data": datetime.strptime(data, "%d/%m/%Y"), "preco": preco}
+                for data, preco in conteudo["dados"]
+            ]
+            self._atualizado_em[tipo_cafe] = datetime.fromisoformat(conteudo["atualizado_em"])
+            self._mtime[tipo_cafe] = mtime
+            self.versao[tipo_cafe] += 1
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Aviso: Erro ao carregar série de {tipo_cafe}: {e}")
+
+    def _recarregar_se_alterado(self, tipo_cafe):
+        """Recarrega a série se o arquivo foi regravado por outra réplica."""
+        try:
+            mtime = os.stat(self._caminho(tipo_cafe)).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime.get(tipo_cafe):
+            self._carregar(tipo_cafe)
+
+    def _salvar(self, tipo_cafe):
+        """Grava a série em disco (escrita atômica)."""
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = self._caminho(tipo_cafe)
+        conteudo = {
+            "atualizado_em": self._atualizado_em[tipo_cafe].isoformat(),
+            "dados": [
+                [registro["data"].strftime("%d/%m/%Y"), registro["preco"]]
+                for registro in self._series[tipo_cafe]
+            ],
+        }
+        # Nome temporário único: escritas simultâneas não se sobrescrevem
+        descritor, temporario = tempfile.mkstemp(
+            dir=self.diretorio, prefix=f"precos_{tipo_cafe}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(descritor, "w", encoding="utf-8") as f:
+                json.dump(conteudo, f)
+            os.replace(temporario, caminho)
+        except BaseException:
+            os.unlink(temporario)
+            raise
+        self._mtime[tipo_cafe] = os.stat(caminho).st_mtime_ns
+
+    def obter_dados(self, tipo_cafe):
+        """
+        Retorna a série em memória ordenada por data (mais recente primeiro).
+
+        Returns:
+            list: Lista de dicionários com 'data' (datetime) e 'preco' (float)
+        """
+        return self._series.get(tipo_cafe, [])
+
+    def possui_dados(self, tipo_cafe):
+        return bool(self._series.get(tipo_cafe))
+
+    def status(self, tipo_cafe):
+        """
+        Metadados de atualização da série.
+
+        Returns:
+            dict: Data da última atualização, idade em segundos, indicador de
+                  dados desatualizados e última falha de atualização (se houver)
+        """
+        atualizado_em = self._atualizado_em.get(tipo_cafe)
+        idade = (datetime.now() - atualizado_em).total_seconds() if atualizado_em else None
+        return {
+            "atualizado_em": atualizado_em.isoformat() if atualizado_em else None,
+            "idade_dados_segundos": round(idade) if idade is not None else None,
+            "dados_desatualizados": idade is None or idade > 2 * PRICE_REFRESH_INTERVAL,
+            "ultima_falha_atualizacao": self._ultima_falha.get(tipo_cafe),
+        }
+
+    def atualizar(self, tipo_cafe, cancelado=None):
+        """
+        Atualiza a série de forma incremental a partir do CEPEA.
+
+        Args:
+            tipo_cafe (str): 'arabica' ou 'robusta'
+            cancelado (threading.Event, opcional): Quando sinalizado, o
+                resultado do download é descartado sem alterar a série
+
+        Returns:
+            int: Quantidade de novos registros adicionados
+
+        Processo:
+            1. Obtém a trava do tipo de café e recarrega a série do disco, caso
+               outra réplica a tenha atualizado (e encerra se isso ocorreu
+               durante a espera pela trava)
+            2. Define a data inicial como o dia seguinte ao registro mais recente
+            3. Baixa e processa apenas o período faltante
+            4. Mescla os novos registros, ordena e limita o tamanho da série
+            5. Persiste a série atualizada em disco
+        """
+        inicio = datetime.now()
+        with self._locks[tipo_cafe], self._trava_arquivo(tipo_cafe):
+            self._recarregar_se_alterado(tipo_cafe)
+            atualizado_em = self._atualizado_em.get(tipo_cafe)
+            if atualizado_em is not None and atualizado_em >= inicio:
+                return 0
+
+            atuais = self._series.get(tipo_cafe, [])
+            data_inicial = atuais[0]["data"] + timedelta(days=1) if atuais else None
+            agora = datetime.now()
+
+            novos = []
+            if data_inicial is None or data_inicial.date() <= agora.date():
+                novos = self._baixar(tipo_cafe, data_inicial)
+
+            if cancelado is not None and cancelado.is_set():
+                raise AtualizacaoCancelada(f"Atualização de {tipo_cafe} cancelada")
+
+            datas_existentes = {registro["data"] for registro in atuais}
+            novos = [registro for registro in novos if registro["data"] not in datas_existentes]
+
+            serie = sorted(atuais + novos, key=lambda x: x["data"], reverse=True)
+            self._series[tipo_cafe] = serie[:self.max_registros]
+            self._atualizado_em[tipo_cafe] = agora
+            self._ultima_falha.pop(tipo_cafe, None)
+            if novos:
+                self.versao[tipo_cafe] += 1
+
+            try:
+                self._salvar(tipo_cafe)
+            except OSError as e:
+                print(f"Aviso: Erro ao salvar série de {tipo_cafe}: {e}")
+
+            return len(novos)
+
+    def _baixar(self, tipo_cafe, data_inicial):
+        return processar_xls(baixar_cepea(tipo_cafe, data_inicial))
+
+    async def atualizar_async(self, tipo_cafe):
+        """
+        Executa `atualizar` no pool de threads, sem bloquear o event loop.
+
+        Chamadas simultâneas para o mesmo tipo de café compartilham uma única
+        atualização em andamento. Se o tempo limite estourar, a atualização é
+        cancelada e todas as chamadas recebem asyncio.TimeoutError.
+        """
+        tarefa = self._em_andamento.get(tipo_cafe)
+        if tarefa is None:
+            tarefa = asyncio.ensure_future(self._executar_atualizacao(tipo_cafe))
+            self._em_andamento[tipo_cafe] = tarefa
+            tarefa.add_done_callback(lambda _: self._em_andamento.pop(tipo_cafe, None))
+
+        # shield: uma requisição cancelada não interrompe a atualização compartilhada
+        return await asyncio.shield(tarefa)
+
+    async def _executar_atualizacao(self, tipo_cafe):
+        cancelado = threading.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(self._executor, self.atualizar, tipo_cafe, cancelado),
+                timeout=PRICE_SCRAPE_TIMEOUT
+            )
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            cancelado.set()
+            raise
+
+    def encerrar(self):
+        """Libera o pool de threads sem aguardar downloads pendentes."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def registrar_falha(self, tipo_cafe, erro):
+        self._ultima_falha[tipo_cafe] = {
+            "data": datetime.now().isoformat(),
+            "erro": str(erro),
+        }
+
+    async def executar_agendador(self):
+        """Atualiza todos os tipos de café periodicamente em segundo plano."""
+        while True:
+            for tipo in TIPOS_CAFE:
+                try:
+                    novos = await self.atualizar_async(tipo)
+                    print(f"[PRECO] Série de {tipo} atualizada: {novos} novos registros")
+                except asyncio.TimeoutError:
+                    self.registrar_falha(tipo, "tempo esgotado")
+                    print(f"[PRECO] Tempo esgotado ao atualizar série de {tipo}")
+                except Exception as e:
+                    self.registrar_falha(tipo, e)
+                    print(f"[PRECO] Falha ao atualizar série de {tipo}: {e}")
+            await asyncio.sleep(PRICE_REFRESH_INTERVAL)
+
+
+armazenamento = ArmazenamentoPrecos()
@@ -1,34 +1,67 @@
-import csv
-from datetime import datetime
+import io
+import numpy as np
+import pandas as pd
 
-def processar_dados(nome_csv):
+# Células de data no formato DD/MM/AAAA
+PADRAO_DATA = r"\d{2}/\d{2}/\d{4}"
+# Quantas colunas à direita da data são examinadas em busca do preço
+COLUNAS_PRECO = 3
+
+def processar_xls(conteudo):
     """
-    Processa dados de um arquivo CSV contendo informações de preços de café.
+    Converte o conteúdo XLS baixado do CEPEA em uma série de preços.
     
     Args:
-        nome_csv (str): Caminho para o arquivo CSV com dados de preços
+        conteudo (bytes): Conteúdo do arquivo XLS
         
     Returns:
         list: Lista de dicionários ordenada por data (mais recente primeiro)
               Cada dicionário contém 'data' (datetime) e 'preco' (float)
               
     Processo:
-        1. Abre e lê arquivo CSV usando DictReader
-        2. Converte string de data para objeto datetime
-        3. Converte string de preço para float
-        4. Ordena dados por data em ordem decrescente
+        1. Lê o XLS em memória usando pandas com engine calamine
+        2. Identifica, de forma vetorizada, as células de data DD/MM/AAAA
+        3. Converte as células com vírgula em preços (formato brasileiro)
+        4. Associa a cada data o primeiro preço nas 3 colunas seguintes
+        5. Remove duplicatas e ordena por data em ordem decrescente
     """
-    with open(nome_csv, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f) 
-        dados = []
+    df = pd.read_excel(io.BytesIO(conteudo), engine="calamine", header=None)
+    if df.empty:
+        return []
+
+    linhas, colunas = df.shape
+    celulas = pd.Series(df.astype(str).to_numpy().ravel()).str.strip()
+
+    e_data = celulas.str.fullmatch(PADRAO_DATA).to_numpy().reshape(linhas, colunas)
 
-        for linha in reader:
-            data = datetime.strptime(linha['Data'], '%d/%m/%Y')
+    sem_espacos = celulas.str.replace(" ", "", regex=False)
+    numeros = pd.to_numeric(
+        sem_espacos.str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+        errors="coerce"
+    ).to_numpy(dtype=float)
+    precos = np.where(sem_espacos.str.contains(",", regex=False).to_numpy(), numeros, np.nan)
+    precos = precos.reshape(linhas, colunas)
 
-            preco = float(linha['Preco_R$'])
+    # Para cada célula, o primeiro preço válido nas colunas à direita
+    preco_ao_lado = np.full((linhas, colunas), np.nan)
+    for deslocamento in range(COLUNAS_PRECO, 0, -1):
+        vizinho = np.full((linhas, colunas), np.nan)
+        vizinho[:, :colunas - deslocamento] = precos[:, deslocamento:]
+        preco_ao_lado = np.where(np.isnan(vizinho), preco_ao_lado, vizinho)
 
-            dados.append({'data': data, 'preco': preco})
+    i, j = np.nonzero(e_data & ~np.isnan(preco_ao_lado))
+    datas = pd.to_datetime(
+        celulas.to_numpy().reshape(linhas, colunas)[i, j],
+        format="%d/%m/%Y",
+        errors="coerce"
+    )
+    serie = pd.DataFrame({"data": datas, "preco": preco_ao_lado[i, j]})
+    serie = serie.dropna().drop_duplicates()
 
+    dados = [
+        {"data": data, "preco": float(preco)}
+        for data, preco in zip(pd.DatetimeIndex(serie["data"]).to_pydatetime(), serie["preco"])
+    ]
     dados.sort(key=lambda x: x['data'], reverse=True)
-    
+
     return dados
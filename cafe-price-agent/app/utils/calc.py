@@ -1,78 +1,165 @@
-from datetime import datetime, timedelta
-import statistics
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+def para_arrays(dados):
+    """
+    Converte a lista de registros em arrays compactos ordenados por data.
+
+    Args:
+        dados (list): Lista de dicionários com 'data' (datetime) e 'preco'
+
+    Returns:
+        tuple: (datas, precos) em ordem crescente de data, com datas em
+               datetime64[D] e preços em float64
+    """
+    datas = np.array([registro['data'] for registro in dados], dtype='datetime64[D]')
+    precos = np.array([registro['preco'] for registro in dados], dtype=np.float64)
+    ordem = np.argsort(datas, kind='stable')
+    return datas[ordem], precos[ordem]
+
+
+def formatar_datas(datas):
+    """Formata datas datetime64[D] como DD/MM/AAAA."""
+    iso = np.datetime_as_string(datas, unit='D')
+    return [f"{d[8:10]}/{d[5:7]}/{d[0:4]}" for d in iso]
+
+
+def _blocos(precos, tamanho, incluir_parcial=False):
+    """Índices (início, fim) dos blocos consecutivos não sobrepostos."""
+    n = len(precos)
+    limite = n if incluir_parcial else n - n % tamanho
+    return [(i, min(i + tamanho, n)) for i in range(0, limite, tamanho)]
+
+
+def medias_por_blocos(datas, precos, tamanho=3, limite=30):
+    """
+    Média aritmética de blocos consecutivos de `tamanho` dias.
+
+    Returns:
+        list: Lista de dicionários com 'periodo' e 'media' (apenas blocos completos)
+    """
+    completos = len(precos) - len(precos) % tamanho
+    medias = precos[:completos].reshape(-1, tamanho).mean(axis=1)
+    rotulos = formatar_datas(datas)
+
+    return [
+        {
+            "periodo": f"{rotulos[inicio]} a {rotulos[fim - 1]}",
+            "media": round(float(media), 2)
+        }
+        for (inicio, fim), media in zip(_blocos(precos, tamanho), medias)
+    ][:limite]
+
+
+def desvios_por_blocos(datas, precos, tamanho=10, limite=9):
+    """
+    Desvio padrão amostral de blocos consecutivos de `tamanho` dias.
+    O último bloco pode ser parcial, desde que tenha ao menos 2 elementos.
+
+    Returns:
+        list: Lista de dicionários com 'periodo' e 'desvio_padrao'
+    """
+    rotulos = formatar_datas(datas)
+    completos = len(precos) - len(precos) % tamanho
+    desvios_blocos = list(precos[:completos].reshape(-1, tamanho).std(axis=1, ddof=1))
+    if len(precos) - completos >= 2:
+        desvios_blocos.append(np.std(precos[completos:], ddof=1))
+
+    # Blocos parciais com menos de 2 elementos não entram no cálculo
+    desvios = [
+        {
+            "periodo": f"{rotulos[inicio]} a {rotulos[fim - 1]}",
+            "desvio_padrao": round(float(desvio), 2)
+        }
+        for (inicio, fim), desvio in zip(_blocos(precos, tamanho, incluir_parcial=True), desvios_blocos)
+    ]
+
+    return desvios[:limite]
+
+
+def calcular_estatisticas(precos, janela=3, span=10, horizonte=1):
+    """
+    Calcula, para cada dia da série, as estatísticas móveis de uma vez.
+
+    Args:
+        precos (np.ndarray): Preços em ordem crescente de data
+        janela (int): Tamanho da janela móvel (média, desvio e z-score)
+        span (int): Span da média móvel exponencial (EWMA)
+        horizonte (int): Distância, em dias, usada no cálculo do retorno
+
+    Returns:
+        dict: Arrays alinhados com `precos` ('media_movel', 'desvio_movel',
+              'ewma', 'retorno', 'zscore'); posições sem histórico
+              suficiente ficam como NaN
+    """
+    n = len(precos)
+    media_movel = np.full(n, np.nan)
+    desvio_movel = np.full(n, np.nan)
+    retorno = np.full(n, np.nan)
+
+    if 0 < janela <= n:
+        janelas = sliding_window_view(precos, janela)
+        media_movel[janela - 1:] = janelas.mean(axis=1)
+        if janela >= 2:
+            desvio_movel[janela - 1:] = janelas.std(axis=1, ddof=1)
+
+    if 0 < horizonte < n:
+        retorno[horizonte:] = precos[horizonte:] / precos[:-horizonte] - 1
+
+    ewma = pd.Series(precos).ewm(span=span, adjust=False).mean().to_numpy()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zscore = np.where(desvio_movel > 0, (precos - media_movel) / desvio_movel, np.nan)
+
+    return {
+        "media_movel": media_movel,
+        "desvio_movel": desvio_movel,
+        "ewma": ewma,
+        "retorno": retorno,
+        "zscore": zscore,
+    }
+
 
 def calcular_desvio_padrao_10_dias(dados_90_dias):
     """
     Calcula desvio padrão de preços em períodos de 10 dias.
-    
+
     Args:
         dados_90_dias (list): Lista de dicionários com 'data' e 'preco'
                              (90 dias mais recentes)
-                             
+
     Returns:
         list: Lista de dicionários com períodos e desvios padrão
               (máximo 9 períodos)
-              
+
     Processo:
-        1. Ordena dados por data crescente
+        1. Converte os dados em arrays ordenados por data crescente
         2. Agrupa em blocos de 10 dias
         3. Calcula desvio padrão de cada bloco
         4. Formata período e retorna resultados
     """
-    dados_ordenados = sorted(dados_90_dias, key=lambda x: x['data'])
-    
-    desvios = []
-    for i in range(0, len(dados_ordenados), 10):
-        periodo = dados_ordenados[i:i+10]
-        if len(periodo) >= 2:  # Precisa de pelo menos 2 elementos para desvio padrão
-            precos = [p['preco'] for p in periodo]
-            desvio = statistics.stdev(precos)
-            
-            data_inicio = periodo[0]['data'].strftime('%d/%m/%Y')
-            data_fim = periodo[-1]['data'].strftime('%d/%m/%Y')
-            
-            desvios.append({
-                "periodo": f"{data_inicio} a {data_fim}",
-                "desvio_padrao": round(desvio, 2)
-            })
-    
-    return desvios[:9]
+    datas, precos = para_arrays(dados_90_dias)
+    return desvios_por_blocos(datas, precos, tamanho=10, limite=9)
 
 
 def calcular_medias_moveis(dados_90_dias):
     """
     Calcula médias móveis de preços em períodos de 3 dias.
-    
+
     Args:
         dados_90_dias (list): Lista de dicionários com 'data' e 'preco'
                              (90 dias mais recentes)
-                             
+
     Returns:
         list: Lista de dicionários com períodos e médias
               (máximo 30 períodos)
-              
+
     Processo:
-        1. Ordena dados por data crescente
+        1. Converte os dados em arrays ordenados por data crescente
         2. Agrupa em blocos de 3 dias
         3. Calcula média aritmética de cada bloco
         4. Formata período e retorna resultados
     """
-    dados_ordenados = sorted(dados_90_dias, key=lambda x: x['data'])
-    
-    medias = [] 
-    for i in range(0, len(dados_ordenados) - 2, 3):
-        periodo = dados_ordenados[i:i+3]
-        if len(periodo) == 3:
-            media_preco = sum([p['preco'] for p in periodo]) / 3
-            
-            data_inicio = periodo[0]['data'].strftime('%d/%m/%Y')
-            data_fim = periodo[2]['data'].strftime('%d/%m/%Y')
-            
-            medias.append({
-                "periodo": f"{data_inicio} a {data_fim}",
-                "media": round(media_preco, 2) 
-            })
-    
-    return medias[:30]
-
-
+    datas, precos = para_arrays(dados_90_dias)
+    return medias_por_blocos(datas, precos, tamanho=3, limite=30)
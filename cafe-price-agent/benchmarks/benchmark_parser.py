@@ -0,0 +1,135 @@
+"""
+Benchmark do parser de planilhas do CEPEA.
+
+Compara o fluxo antigo (XLS em disco -> CSV -> DictReader/strptime, com
+iloc por célula) com o parser em memória `processar_xls`, verificando que
+ambos produzem a mesma série.
+
+Uso:
+    python -m benchmarks.benchmark_parser [caminho_exportacao_cepea.xls] [--anos 5]
+
+Sem caminho, gera uma exportação sintética no layout do CEPEA com vários anos
+de cotações diárias.
+"""
+
+import argparse
+import csv
+import io
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+from openpyxl import Workbook
+
+from app.services.processor import processar_xls
+
+
+def gerar_exportacao_sintetica(anos):
+    """Gera um XLSX com cabeçalho e linhas de cotação no formato do CEPEA."""
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["INDICADOR DO CAFÉ ARÁBICA CEPEA/ESALQ"])
+    ws.append([])
+    ws.append(["Data", "À vista R$", "À vista US$"])
+
+    dia = datetime.now() - timedelta(days=365 * anos)
+    preco = 900.0
+    while dia <= datetime.now():
+        if dia.weekday() < 5:
+            preco = max(300.0, preco * (1 + random.gauss(0, 0.01)))
+            ws.append([
+                dia.strftime("%d/%m/%Y"),
+                f"{preco:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
+                f"{preco / 5:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
+            ])
+        dia += timedelta(days=1)
+
+    ws.append([])
+    ws.append(["Fonte: Cepea"])
+
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def fluxo_legado(conteudo, diretorio):
+    """Implementação anterior: grava XLS, converte para CSV e relê o CSV."""
+    nome_xls = os.path.join(diretorio, "cepea_temp.xls")
+    nome_csv = os.path.join(diretorio, "cepea_dados.csv")
+    with open(nome_xls, "wb") as f:
+        f.write(conteudo)
+
+    df = pd.read_excel(nome_xls, engine="calamine")
+    dados = []
+    for i in range(len(df)):
+        for j in range(len(df.columns)):
+            valor = str(df.iloc[i, j]).strip()
+            if (len(valor) == 10 and valor[2] == "/" and valor[5] == "/"
+                and valor.replace("/", "").isdigit()):
+                data = valor
+                for k in range(j + 1, min(j + 4, len(df.columns))):
+                    preco_str = str(df.iloc[i, k]).replace(" ", "")
+                    if "," in preco_str:
+                        try:
+                            preco = float(preco_str.replace(".", "").replace(",", "."))
+                            dados.append((data, preco))
+                            break
+                        except ValueError:
+                            continue
+    dados = list(dict.fromkeys(dados))
+
+    with open(nome_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Data", "Preco_R$"])
+        for linha in dados:
+            writer.writerow(linha)
+
+    with open(nome_csv, "r", encoding="utf-8") as f:
+        resultado = [
+            {"data": datetime.strptime(linha["Data"], "%d/%m/%Y"), "preco": float(linha["Preco_R$"])}
+            for linha in csv.DictReader(f)
+        ]
+    resultado.sort(key=lambda x: x["data"], reverse=True)
+
+    os.remove(nome_xls)
+    os.remove(nome_csv)
+    return resultado
+
+
+def medir(funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resultado = funcao()
+    return (time.perf_counter() - inicio) / repeticoes, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("arquivo", nargs="?", help="Exportação XLS/XLSX do CEPEA")
+    parser.add_argument("--anos", type=int, default=5, help="Anos da exportação sintética")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.arquivo:
+        with open(args.arquivo, "rb") as f:
+            conteudo = f.read()
+    else:
+        conteudo = gerar_exportacao_sintetica(args.anos)
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        tempo_legado, serie_legado = medir(lambda: fluxo_legado(conteudo, diretorio), args.repeticoes)
+    tempo_novo, serie_nova = medir(lambda: processar_xls(conteudo), args.repeticoes)
+
+    assert serie_nova == serie_legado, "As séries divergem entre os dois fluxos"
+
+    print(f"Registros: {len(serie_nova)}")
+    print(f"Fluxo legado (disco + CSV): {tempo_legado * 1000:8.1f} ms")
+    print(f"processar_xls (memória):    {tempo_novo * 1000:8.1f} ms")
+    print(f"Ganho: {tempo_legado / tempo_novo:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
-import httpx
+from app.clients.pool import registry
 from app.utils.config import AGRO_AGENT_URL
 
+registry.register("agro", AGRO_AGENT_URL, timeout=600.0)
+
 async def get_agro_agent_client():
-    async with httpx.AsyncClient(base_url=AGRO_AGENT_URL, timeout=600.0) as client:
-        yield client
\ No newline at end of file
+    return registry.get("agro")
@@ -1,6 +1,7 @@
-import httpx
+from app.clients.pool import registry
 from app.utils.config import CLIMATE_AGENT_URL
 
+registry.register("climate", CLIMATE_AGENT_URL, timeout=30.0)
+
 async def get_climate_agent_client():
-    async with httpx.AsyncClient(base_url=CLIMATE_AGENT_URL, timeout=30.0) as client:
-        yield client
\ No newline at end of file
+    return registry.get("climate")
@@ -1,6 +1,7 @@
-import httpx
+from app.clients.pool import registry
 from app.utils.config import DATA_SERVICE_URL
 
+registry.register("data", DATA_SERVICE_URL, timeout=30.0)
+
 async def get_data_service_client():
-    async with httpx.AsyncClient(base_url=DATA_SERVICE_URL, timeout=30.0) as client:
-        yield client
\ No newline at end of file
+    return registry.get("data")
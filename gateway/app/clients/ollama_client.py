@@ -1,6 +1,7 @@
-import httpx
+from app.clients.pool import registry
 from app.utils.config import OLLAMA_URL
 
+registry.register("ollama", OLLAMA_URL, timeout=600.0)
+
 async def get_ollama_client():
-    async with httpx.AsyncClient(base_url=OLLAMA_URL, timeout=600.0) as client:
-        yield client
\ No newline at end of file
+    return registry.get("ollama")
@@ -0,0 +1,101 @@
+import httpx
+from typing import Dict, Optional
+
+from app.utils.config import (
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP2_ENABLED,
+)
+
+
+# =====================================================
+# REGISTRO DE CLIENTES HTTP COMPARTILHADOS
+# =====================================================
+class ClientRegistry:
+    """
+    Mantém um httpx.AsyncClient de longa duração por serviço upstream.
+
+    Os clientes são criados no startup do gateway (lifespan) e fechados
+    no shutdown, reaproveitando conexões keep-alive entre requisições
+    em vez de abrir uma conexão TCP nova a cada chamada.
+    """
+
+    def __init__(self):
+        self._specs: Dict[str, dict] = {}
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._request_counts: Dict[str, int] = {}
+
+    def register(self, name: str, base_url: str, timeout: float):
+        """Registra um serviço upstream e o timeout usado nas suas requisições."""
+        self._specs[name] = {"base_url": base_url, "timeout": timeout}
+        self._request_counts.setdefault(name, 0)
+
+    def _build_client(self, name: str) -> httpx.AsyncClient:
+        spec = self._specs[name]
+
+        async def count_request(request: httpx.Request):
+            self._request_counts[name] += 1
+
+        return httpx.AsyncClient(
+            base_url=spec["base_url"],
+            timeout=spec["timeout"],
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            http2=HTTP2_ENABLED,
+            event_hooks={"request": [count_request]},
+        )
+
+    async def start(self):
+        """Cria os clientes de todos os serviços registrados."""
+        for name in self._specs:
+            if name not in self._clients:
+                self._clients[name] = self._build_client(name)
+
+    async def close(self):
+        """Fecha todos os clientes e libera as conexões do pool."""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """
+        Retorna o cliente compartilhado do serviço.
+
+        Cria o cliente sob demanda caso o lifespan ainda não tenha rodado
+        (ex: execução fora do uvicorn).
+        """
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._build_client(name)
+            self._clients[name] = client
+        return client
+
+    def stats(self) -> Dict[str, dict]:
+        """Retorna a utilização atual do pool de conexões de cada serviço."""
+        result = {}
+        for name, spec in self._specs.items():
+            client: Optional[httpx.AsyncClient] = self._clients.get(name)
+            connections = []
+            if client is not None:
+                pool = getattr(client._transport, "_pool", None)
+                connections = list(getattr(pool, "connections", []))
+
+            idle = sum(1 for c in connections if c.is_idle())
+            result[name] = {
+                "base_url": spec["base_url"],
+                "open": client is not None and not client.is_closed,
+                "connections": len(connections),
+                "active_connections": len(connections) - idle,
+                "idle_connections": idle,
+                "max_connections": HTTP_MAX_CONNECTIONS,
+                "max_keepalive_connections": HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                "requests_total": self._request_counts.get(name, 0),
+            }
+        return result
+
+
+registry = ClientRegistry()
@@ -1,6 +1,7 @@
-import httpx
+from app.clients.pool import registry
 from app.utils.config import PRICE_AGENT_URL
 
+registry.register("price", PRICE_AGENT_URL, timeout=30.0)
+
 async def get_price_agent_client():
-    async with httpx.AsyncClient(base_url=PRICE_AGENT_URL, timeout=30.0) as client:
-        yield client
+    return registry.get("price")
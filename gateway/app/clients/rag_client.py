@@ -1,7 +1,7 @@
-import httpx
+from app.clients.pool import registry
 from app.utils.config import RAG_SERVICE_URL
 
-async def get_rag_service_client():
-    async with httpx.AsyncClient(base_url=RAG_SERVICE_URL, timeout=600.0) as client:
-        yield client
+registry.register("rag", RAG_SERVICE_URL, timeout=600.0)
 
+async def get_rag_service_client():
+    return registry.get("rag")
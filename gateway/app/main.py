@@ -1,7 +1,10 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from .utils.config import GATEWAY_HOST, GATEWAY_PORT
+from .clients.pool import registry
 
 from .routes import (
     agro_routes, analysis_routes,  auth_routes,
@@ -10,6 +13,16 @@ from .routes import (
 )
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Abre os clientes HTTP compartilhados no startup e os fecha no shutdown.
+    """
+    await registry.start()
+    yield
+    await registry.close()
+
+
 app = FastAPI(
     title="AgroAnalytics Gateway",
     description=(
@@ -24,6 +37,7 @@ app = FastAPI(
         "- 🤖 Ollama: Modelos de linguagem local"
     ),
     version="1.1.0",
+    lifespan=lifespan,
 )
 
 
@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
 import httpx
 from app.clients.agro_client import get_agro_agent_client
 from app.utils.jwt_utils import verify_token
+from app.utils.streaming import proxy_stream
 from pydantic import BaseModel
+from typing import List
 
 
 # =====================================================
@@ -29,6 +32,10 @@ class AgroAnalysisRequest(BaseModel):
         }
 
 
+class AgroBatchRequest(BaseModel):
+    lotes: List[AgroAnalysisRequest]
+
+
 class AgroAnalysisResponse(BaseModel):
     decisao: str
     explicacao_decisao: str
@@ -50,7 +57,7 @@ router = APIRouter(prefix="/agro", tags=["agro"])
 
 
 @router.post("/recommend", response_model=AgroAnalysisResponse)
-async def analyze_coffee(analysis_data: AgroAnalysisRequest, payload: dict = Depends(verify_token), agro_client: httpx.AsyncClient = Depends(get_agro_agent_client)):
+async def analyze_coffee(analysis_data: AgroAnalysisRequest, stream: bool = False, fast: bool = False, payload: dict = Depends(verify_token), agro_client: httpx.AsyncClient = Depends(get_agro_agent_client)):
     """
     Analisa um lote de café e retorna uma recomendação de venda/aguardar.
 
@@ -62,12 +69,71 @@ async def analyze_coffee(analysis_data: AgroAnalysisRequest, payload: dict = Dep
     - **estado_cafe**: Estado atual do café (verde, torrada, moído)
     
     Retorna decisão e explicação detalhada do agente agronômico.
+
+    Com `?stream=true` a resposta é NDJSON: um evento `decision` assim que a
+    decisão quantitativa fica pronta, eventos `token` com a explicação à
+    medida que o modelo a gera e um evento `done` com a explicação completa.
+
+    Com `?fast=true` retorna na hora a decisão, os scores e o
+    `explicacao_job_id`; a explicação é consultada depois em
+    `/agro/recommend/explanation/{job_id}`.
+    """
+    if stream:
+        return await proxy_stream(
+            agro_client, "POST", "/recommend", "Agro Agent",
+            params={"stream": "true"}, json=analysis_data.dict()
+        )
+
+    try:
+        response = await agro_client.post(
+            "/recommend", params={"fast": "true"} if fast else None, json=analysis_data.dict()
+        )
+        response.raise_for_status()
+        if fast:
+            return JSONResponse(content=response.json())
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
+    except httpx.RequestError as e:
+            raise HTTPException(status_code=503, detail=f"Agro Agent não disponível: {str(e)}")
+
+
+@router.post("/recommend/batch")
+async def analyze_coffee_batch(batch_data: AgroBatchRequest, payload: dict = Depends(verify_token), agro_client: httpx.AsyncClient = Depends(get_agro_agent_client)):
+    """
+    Analisa vários lotes de café de uma vez (ex.: cooperativas).
+
+    - **lotes**: lista de lotes, cada um com os mesmos campos de `/agro/recommend`
+
+    A resposta é NDJSON, repassada à medida que é gerada: um evento
+    `decision` por lote assim que as decisões ficam prontas, um evento
+    `result` por lote quando sua explicação termina (`index` indica a
+    posição do lote na lista), `error` para lotes que não puderam ser
+    analisados e um evento `done` final.
+    """
+    return await proxy_stream(
+        agro_client, "POST", "/recommend/batch", "Agro Agent",
+        json=batch_data.dict()
+    )
+
+
+@router.get("/recommend/explanation/{job_id}")
+async def get_explanation(job_id: str, wait: float = 0, payload: dict = Depends(verify_token), agro_client: httpx.AsyncClient = Depends(get_agro_agent_client)):
+    """
+    Consulta a explicação de uma recomendação feita com `?fast=true`.
+
+    - **job_id**: `explicacao_job_id` retornado pela recomendação
+    - **wait**: segundos para aguardar a explicação ficar pronta (0 = não espera)
+
+    Retorna `status` (pending, running, completed) e, quando concluída, a `explicacao_decisao`.
     """
     try:
-        response = await agro_client.post("/recommend", json=analysis_data.dict())
+        response = await agro_client.get(f"/recommend/explanation/{job_id}", params={"wait": wait})
         response.raise_for_status()
         return response.json()
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="Agro Agent timeout")
     except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"Agro Agent não disponível: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=503, detail=f"Agro Agent não disponível: {str(e)}")
@@ -8,6 +8,7 @@ from app.clients.price_client import get_price_agent_client
 from app.clients.agro_client import get_agro_agent_client
 from app.clients.rag_client import get_rag_service_client
 from app.clients.ollama_client import get_ollama_client
+from app.clients.pool import registry
 
 
 router = APIRouter(tags=["health"])
@@ -41,6 +42,21 @@ async def health_check():
     }
 
 
+@router.get("/health/pool")
+async def pool_stats():
+    """
+    Utilização dos pools de conexão HTTP do gateway.
+
+    Para cada serviço upstream retorna conexões abertas, ativas e ociosas,
+    limites configurados e total de requisições encaminhadas.
+    """
+    return {
+        "service": "gateway",
+        "pools": registry.stats(),
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+
 @router.get("/health/full")
 async def full_health_check(
     climate_client: httpx.AsyncClient = Depends(get_climate_agent_client),
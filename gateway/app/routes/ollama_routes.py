@@ -4,6 +4,7 @@ import httpx
 import time
 from app.clients.ollama_client import get_ollama_client
 from app.utils.jwt_utils import verify_token
+from app.utils.streaming import proxy_stream
 
 
 # =====================================================
@@ -19,10 +20,16 @@ async def proxy_ollama_generate(request: Request, ollama_client: httpx.AsyncClie
     
     Retorna resposta gerada pelo modelo com métricas de tempo
     incluindo duração do proxy no gateway.
+
+    Com `"stream": true` (padrão do Ollama) as linhas NDJSON geradas pelo
+    modelo são repassadas ao cliente à medida que chegam.
     
     Usado pelos agentes para processamento de linguagem natural.
     """
     body = await request.json()
+    if body.get("stream", True):
+        return await proxy_stream(ollama_client, "POST", "/api/generate", "Ollama", json=body)
+
     try:
         start = time.perf_counter()
         response = await ollama_client.post("/api/generate", json=body)
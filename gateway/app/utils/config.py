@@ -19,6 +19,12 @@ RAG_SERVICE_URL = os.getenv("RAG_SERVICE_URL", "http://rag-service:8000")
 PRICE_AGENT_URL = os.getenv("PRICE_AGENT_URL", "http://price-agent:8000")
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://ollama:11434")
 
+# Pool de conexões HTTP com os serviços
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
 # Configurações JWT
 SECRET_KEY = os.getenv("SECRET_KEY", "dev_secret_key_change_in_production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
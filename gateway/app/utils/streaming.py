@@ -0,0 +1,38 @@
+import httpx
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+
+# Desliga o buffer do nginx (gateway-lb) para que cada linha chegue ao cliente assim que é gerada
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+async def proxy_stream(client: httpx.AsyncClient, method: str, url: str, service: str, **kwargs) -> StreamingResponse:
+    """
+    Repassa a resposta de um serviço upstream em streaming, sem bufferizar.
+
+    Erros antes do início do corpo viram HTTPException (como nos demais
+    proxies); depois disso os bytes são repassados à medida que chegam e a
+    conexão upstream é fechada ao fim da resposta.
+    """
+    request = client.build_request(method, url, **kwargs)
+    try:
+        response = await client.send(request, stream=True)
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail=f"{service} timeout")
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=503, detail=f"{service} não disponível: {str(e)}")
+
+    if response.is_error:
+        await response.aread()
+        await response.aclose()
+        raise HTTPException(status_code=response.status_code, detail=response.text)
+
+    return StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        media_type=response.headers.get("content-type", "application/x-ndjson"),
+        headers=STREAM_HEADERS,
+        background=BackgroundTask(response.aclose),
+    )
@@ -0,0 +1,162 @@
+"""
+Benchmark de recall por tamanho de chunk.
+
+Extrai e limpa as páginas dos PDFs, sorteia trechos de frases como consultas
+e mede, para cada configuração de chunking, a fração de consultas cujo trecho
+de origem aparece entre os k primeiros chunks recuperados (recall@k). Também
+mostra o tamanho médio do contexto devolvido (proxy do tamanho do prompt).
+A linha "pagina" é a indexação antiga: uma página inteira por documento.
+
+Uso:
+    python -m benchmarks.benchmark_chunking [pasta_pdfs] [--consultas 200] [--ollama]
+
+Por padrão a similaridade é TF-IDF (roda sem Ollama); com --ollama usa os
+embeddings reais de `embed_batch`.
+"""
+
+import argparse
+import glob
+import math
+import os
+import random
+import re
+import time
+from collections import Counter, defaultdict
+
+from pypdf import PdfReader
+
+from text_processing import chunk_text, clean_text
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def carregar_paginas(pasta):
+    paginas = []
+    for caminho in sorted(glob.glob(os.path.join(pasta, "*.pdf"))):
+        for numero, pagina in enumerate(PdfReader(caminho).pages):
+            texto = clean_text(pagina.extract_text() or "")
+            if texto:
+                paginas.append({"file": os.path.basename(caminho), "page": numero, "text": texto})
+    return paginas
+
+
+def sortear_consultas(paginas, quantidade, seed=42):
+    """Trechos de 8 a 14 palavras, com a posição de origem na página."""
+    rng = random.Random(seed)
+    consultas = []
+    while len(consultas) < quantidade:
+        pagina = rng.choice(paginas)
+        palavras = list(re.finditer(r"\S+", pagina["text"]))
+        tamanho = rng.randint(8, 14)
+        if len(palavras) <= tamanho:
+            continue
+        inicio = rng.randrange(len(palavras) - tamanho)
+        ini, fim = palavras[inicio].start(), palavras[inicio + tamanho - 1].end()
+        consultas.append({
+            "text": pagina["text"][ini:fim],
+            "file": pagina["file"],
+            "page": pagina["page"],
+            "meio": (ini + fim) // 2,
+        })
+    return consultas
+
+
+def gerar_chunks(paginas, tamanho, sobreposicao):
+    chunks = []
+    for pagina in paginas:
+        if tamanho is None:
+            partes = [{"text": pagina["text"], "start": 0, "end": len(pagina["text"])}]
+        else:
+            partes = chunk_text(pagina["text"], size=tamanho, overlap=sobreposicao)
+        for parte in partes:
+            chunks.append(dict(parte, file=pagina["file"], page=pagina["page"]))
+    return chunks
+
+
+class IndiceTfidf:
+    def __init__(self, textos):
+        contagens = [Counter(_TOKEN_RE.findall(t.lower())) for t in textos]
+        df = Counter(termo for c in contagens for termo in c)
+        self.idf = {termo: math.log(len(textos) / n) + 1 for termo, n in df.items()}
+        self.postings = defaultdict(list)
+        self.normas = []
+        for i, c in enumerate(contagens):
+            pesos = {termo: (1 + math.log(n)) * self.idf[termo] for termo, n in c.items()}
+            self.normas.append(math.sqrt(sum(p * p for p in pesos.values())) or 1.0)
+            for termo, peso in pesos.items():
+                self.postings[termo].append((i, peso))
+
+    def buscar(self, consulta, k):
+        scores = defaultdict(float)
+        for termo, n in Counter(_TOKEN_RE.findall(consulta.lower())).items():
+            peso = (1 + math.log(n)) * self.idf.get(termo, 0.0)
+            for i, p in self.postings.get(termo, ()):
+                scores[i] += peso * p
+        return sorted(scores, key=lambda i: scores[i] / self.normas[i], reverse=True)[:k]
+
+
+class IndiceEmbeddings:
+    def __init__(self, textos):
+        import numpy as np
+        from embeddings import embed_batch
+
+        self.np = np
+        self.embed_batch = embed_batch
+        self.matriz = self._normalizar(np.array(embed_batch(textos), dtype=np.float32))
+
+    def _normalizar(self, m):
+        return m / (self.np.linalg.norm(m, axis=-1, keepdims=True) + 1e-12)
+
+    def buscar(self, consulta, k):
+        q = self._normalizar(self.np.array(self.embed_batch([consulta])[0], dtype=self.np.float32))
+        return list(self.np.argsort(-(self.matriz @ q))[:k])
+
+
+def avaliar(chunks, consultas, indice_cls, ks):
+    indice = indice_cls([c["text"] for c in chunks])
+    acertos = Counter()
+    contexto = 0
+    for consulta in consultas:
+        ids = indice.buscar(consulta["text"], max(ks))
+        contexto += sum(len(chunks[i]["text"]) for i in ids[:max(ks)])
+        for posicao, i in enumerate(ids):
+            c = chunks[i]
+            if c["file"] == consulta["file"] and c["page"] == consulta["page"] and c["start"] <= consulta["meio"] < c["end"]:
+                for k in ks:
+                    if posicao < k:
+                        acertos[k] += 1
+                break
+    return {k: acertos[k] / len(consultas) for k in ks}, contexto / len(consultas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("pasta", nargs="?", default="./pdfs", help="Pasta com os PDFs")
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--tamanhos", default="40,80,160,320", help="Tamanhos de chunk (tokens)")
+    parser.add_argument("--ollama", action="store_true", help="Usar embeddings do Ollama")
+    args = parser.parse_args()
+
+    paginas = carregar_paginas(args.pasta)
+    consultas = sortear_consultas(paginas, args.consultas)
+    indice_cls = IndiceEmbeddings if args.ollama else IndiceTfidf
+    ks = (1, 4)
+
+    print(f"{len(paginas)} páginas, {len(consultas)} consultas, similaridade: "
+          f"{'embeddings' if args.ollama else 'TF-IDF'}\n")
+    print(f"{'config':<14}{'chunks':>8}{'chars/chunk':>13}{'recall@1':>10}{'recall@4':>10}{'contexto@4':>12}{'tempo':>8}")
+
+    configs = [("pagina", None, 0)] + [
+        (f"{t} tok/{t // 5}", t, t // 5) for t in map(int, args.tamanhos.split(","))
+    ]
+    for nome, tamanho, sobreposicao in configs:
+        inicio = time.perf_counter()
+        chunks = gerar_chunks(paginas, tamanho, sobreposicao)
+        recall, contexto = avaliar(chunks, consultas, indice_cls, ks)
+        media = sum(len(c["text"]) for c in chunks) / len(chunks)
+        print(f"{nome:<14}{len(chunks):>8}{media:>13.0f}{recall[1]:>10.2f}{recall[4]:>10.2f}"
+              f"{contexto:>12.0f}{time.perf_counter() - inicio:>7.1f}s")
+
+
+if __name__ == "__main__":
+    main()
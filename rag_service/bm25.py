@@ -0,0 +1,136 @@
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Palavras funcionais do português ignoradas no índice e na detecção de
+# consultas do tipo "palavra-chave"
+STOPWORDS = {
+    "a", "o", "as", "os", "um", "uma", "uns", "umas", "de", "do", "da", "dos", "das",
+    "em", "no", "na", "nos", "nas", "por", "pelo", "pela", "para", "com", "sem", "sob",
+    "e", "ou", "que", "se", "ao", "aos", "como", "mais", "menos", "muito", "sua", "seu",
+    "qual", "quais", "quando", "onde", "porque", "quanto", "isso", "este", "esta",
+    "esse", "essa", "ser", "sao", "foi", "ha", "entre", "sobre", "tambem", "ja", "nao",
+}
+
+
+def tokenize(text: str):
+    """Tokens minúsculos, sem acentos e sem stopwords."""
+    text = "".join(
+        c for c in unicodedata.normalize("NFD", text.lower())
+        if unicodedata.category(c) != "Mn"
+    )
+    return [t for t in _TOKEN_RE.findall(text) if len(t) > 1 and t not in STOPWORDS]
+
+
+def is_keyword_query(query: str, max_terms: int = 12) -> bool:
+    """
+    Consulta em formato de palavras-chave: poucos termos, sem pergunta e sem
+    palavras funcionais (ex: "café arábica preço colheita").
+    """
+    if "?" in query:
+        return False
+    words = _TOKEN_RE.findall(query.lower())
+    return 0 < len(words) <= max_terms and not any(w in STOPWORDS for w in words)
+
+
+class BM25Index:
+    """
+    Índice invertido BM25 em memória sobre os textos dos chunks.
+
+    Atualizado a cada upsert/remoção na coleção do ChromaDB e reconstruído
+    a partir dela no startup; guarda também texto e metadados para que a
+    busca léxica não precise consultar o ChromaDB.
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._docs = {}
+        self._postings = {}
+        self._total_len = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _remove(self, doc_id):
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        self._total_len -= doc["len"]
+        for term in doc["tf"]:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+
+    def upsert(self, ids, documents, metadatas):
+        with self._lock:
+            for doc_id, text, metadata in zip(ids, documents, metadatas):
+                self._remove(doc_id)
+                tf = Counter(tokenize(text))
+                length = sum(tf.values())
+                self._docs[doc_id] = {"text": text, "metadata": metadata, "tf": tf, "len": length}
+                self._total_len += length
+                for term, count in tf.items():
+                    self._postings.setdefault(term, {})[doc_id] = count
+
+    def delete(self, ids):
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def delete_file(self, file_name: str):
+        with self._lock:
+            for doc_id in [i for i, d in self._docs.items() if d["metadata"].get("file") == file_name]:
+                self._remove(doc_id)
+
+    def rebuild(self, collection, page_size: int = 1000):
+        """Reconstrói o índice com todos os documentos da coleção."""
+        with self._lock:
+            self._docs, self._postings, self._total_len = {}, {}, 0
+        offset = 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            self.upsert(page["ids"], page["documents"], page["metadatas"])
+            offset += len(page["ids"])
+
+    def document(self, doc_id):
+        doc = self._docs.get(doc_id)
+        return {"text": doc["text"], "metadata": doc["metadata"]} if doc else None
+
+    def search(self, query: str, k: int, where=None):
+        """
+        Args:
+            where (callable, opcional): Recebe os metadados do chunk e indica
+                se ele pode entrar no resultado
+
+        Returns:
+            list: Tuplas (id, score) em ordem decrescente de score BM25
+        """
+        with self._lock:
+            n = len(self._docs)
+            if not n:
+                return []
+            avg_len = self._total_len / n
+            scores = Counter()
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    if where is not None and not where(self._docs[doc_id]["metadata"]):
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._docs[doc_id]["len"] / avg_len)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores.most_common(k)
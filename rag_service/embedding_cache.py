@@ -0,0 +1,130 @@
+import hashlib
+import math
+import os
+import re
+import threading
+from array import array
+from collections import OrderedDict
+
+# Diretório do cache persistente; vazio mantém o cache apenas em memória
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "/data/embedding_cache")
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "4096"))
+# Normalização aplicada a todo embedding armazenado; faz parte da chave do cache
+EMBED_NORMALIZATION = "l2"
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def l2_normalize(embedding) -> list:
+    """Escala o vetor para norma 1 (vetores nulos ficam como estão)."""
+    norm = math.sqrt(sum(x * x for x in embedding))
+    return [x / norm for x in embedding] if norm else list(embedding)
+
+
+class EmbeddingCache:
+    """
+    Cache de embeddings chaveado por (modelo, normalização, sha256(texto)).
+
+    Todo embedding é normalizado (norma L2 = 1) ao ser armazenado: o
+    `/api/embed` do Ollama já devolve vetores normalizados e o
+    `/api/embeddings` não, então documentos e consultas ficam na mesma
+    escala qualquer que seja o endpoint que os gerou.
+
+    Camada em memória LRU limitada e camada em disco com um arquivo por
+    embedding, gravado como float32 bruto (4 bytes por dimensão) em
+    `<dir>/<modelo>/<normalização>/<2 primeiros hex>/<sha256>.f32`.
+    Entradas gravadas sem normalização (diretório do modelo) são ignoradas.
+    """
+
+    def __init__(self, model: str, disk_dir: str = EMBED_CACHE_DIR, max_entries: int = EMBED_CACHE_MAX_ENTRIES):
+        self.model = model
+        self.max_entries = max_entries
+        self.disk_dir = (
+            os.path.join(disk_dir, re.sub(r"[^\w.-]", "_", model), EMBED_NORMALIZATION) if disk_dir else None
+        )
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.disk_dir, digest[:2], f"{digest}.f32")
+
+    def _disk_get(self, digest: str):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._path(digest), "rb") as f:
+                vector = array("f")
+                vector.frombytes(f.read())
+        except (OSError, ValueError):
+            return None
+        return vector if len(vector) else None
+
+    def _disk_set(self, digest: str, vector: array):
+        if not self.disk_dir:
+            return
+        path = self._path(digest)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(vector.tobytes())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[RAG] Falha ao gravar embedding em disco: {e}")
+
+    def _store(self, digest: str, vector: array):
+        self._entries[digest] = vector
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, text: str):
+        """Retorna o embedding (lista de floats) do texto ou None."""
+        digest = text_hash(text)
+        with self._lock:
+            vector = self._entries.get(digest)
+            if vector is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return vector.tolist()
+
+        vector = self._disk_get(digest)
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(digest, vector)
+        return vector.tolist()
+
+    def put(self, text: str, embedding):
+        """
+        Normaliza e armazena o embedding e o retorna em float32, igual ao
+        que uma leitura posterior do cache devolveria.
+        """
+        digest = text_hash(text)
+        vector = array("f", l2_normalize(embedding))
+        with self._lock:
+            self._store(digest, vector)
+        self._disk_set(digest, vector)
+        return vector.tolist()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                "model": self.model,
+                "normalization": EMBED_NORMALIZATION,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_enabled": bool(self.disk_dir),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.disk_hits) / total, 3) if total else 0.0,
+            }
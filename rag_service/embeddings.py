@@ -0,0 +1,144 @@
+import os
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from embedding_cache import EmbeddingCache
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://ollama:11434")
+EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+
+# Textos enviados por requisição ao endpoint de lote do Ollama
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+# Requisições de embedding simultâneas durante a indexação
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_TIMEOUT = float(os.getenv("EMBED_TIMEOUT", "120"))
+
+# Sessão compartilhada: reaproveita conexões keep-alive com o Ollama
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=EMBED_CONCURRENCY))
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=EMBED_CONCURRENCY))
+
+# Versões antigas do Ollama não têm /api/embed (lote); detectado na primeira chamada
+_batch_supported = None
+_batch_lock = threading.Lock()
+
+embedding_cache = EmbeddingCache(EMBED_MODEL)
+
+# Cliente assíncrono compartilhado, usado pelas buscas (criado sob demanda)
+_async_client = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            base_url=OLLAMA_URL,
+            timeout=EMBED_TIMEOUT,
+            limits=httpx.Limits(max_connections=EMBED_CONCURRENCY * 4, max_keepalive_connections=EMBED_CONCURRENCY),
+        )
+    return _async_client
+
+
+async def aclose():
+    if _async_client is not None:
+        await _async_client.aclose()
+
+
+async def aembed_text(text: str):
+    """
+    Versão assíncrona de `embed_text`, sem bloquear o event loop. Usa o
+    mesmo endpoint dos documentos (`/api/embed` quando disponível).
+    """
+    embedding = embedding_cache.get(text)
+    if embedding is None:
+        embedding = embedding_cache.put(text, await _arequest_one(text))
+    return embedding
+
+
+async def _arequest_one(text: str):
+    client = get_async_client()
+    if _batch_supported is not False:
+        r = await client.post("/api/embed", json={"model": EMBED_MODEL, "input": [text]})
+        if not _route_missing(r):
+            r.raise_for_status()
+            _set_batch_supported(True)
+            return r.json()["embeddings"][0]
+        _set_batch_supported(False)
+
+    r = await client.post("/api/embeddings", json={"model": EMBED_MODEL, "prompt": text})
+    r.raise_for_status()
+    return r.json()["embedding"]
+
+
+def embed_text(text: str):
+    """Gera o embedding de um único texto, consultando antes o cache."""
+    embedding = embedding_cache.get(text)
+    if embedding is None:
+        embedding = embedding_cache.put(text, _request_one(text))
+    return embedding
+
+
+def embed_batch(texts):
+    """
+    Gera os embeddings de uma lista de textos, na mesma ordem.
+
+    Textos já presentes no cache (ou repetidos no próprio lote) não são
+    reenviados ao Ollama.
+    """
+    results = [embedding_cache.get(t) for t in texts]
+    missing = list(dict.fromkeys(t for t, e in zip(texts, results) if e is None))
+    if not missing:
+        return results
+
+    computed = {
+        text: embedding_cache.put(text, embedding)
+        for text, embedding in zip(missing, _request_batch(missing))
+    }
+    return [e if e is not None else computed[t] for t, e in zip(texts, results)]
+
+
+def _request_one(text: str):
+    """Chama /api/embeddings para um único texto."""
+    r = _session.post(
+        f"{OLLAMA_URL}/api/embeddings",
+        json={"model": EMBED_MODEL, "prompt": text},
+        timeout=EMBED_TIMEOUT
+    )
+    r.raise_for_status()
+    return r.json()["embedding"]
+
+
+def _request_batch(texts):
+    """
+    Usa o endpoint de lote /api/embed quando disponível; caso contrário,
+    recorre a uma chamada de /api/embeddings por texto.
+    """
+    if _batch_supported is not False:
+        r = _session.post(
+            f"{OLLAMA_URL}/api/embed",
+            json={"model": EMBED_MODEL, "input": list(texts)},
+            timeout=EMBED_TIMEOUT
+        )
+        if not _route_missing(r):
+            r.raise_for_status()
+            _set_batch_supported(True)
+            return r.json()["embeddings"]
+        _set_batch_supported(False)
+
+    return [_request_one(t) for t in texts]
+
+
+def _route_missing(r) -> bool:
+    """404 sem corpo JSON: a versão do Ollama não tem /api/embed."""
+    # 404 com corpo JSON ({"error": ...}) é erro do modelo, não rota ausente
+    return r.status_code == 404 and not r.headers.get("content-type", "").startswith("application/json")
+
+
+def _set_batch_supported(supported: bool):
+    global _batch_supported
+    with _batch_lock:
+        if not supported and _batch_supported is None:
+            print("[RAG] /api/embed indisponível; usando /api/embeddings por texto")
+        _batch_supported = supported
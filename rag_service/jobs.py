@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import rag_loader
+
+# Quantidade de jobs finalizados mantidos para consulta
+REINDEX_JOBS_HISTORY = 20
+
+
+class ReindexJob:
+    """Uma execução de `load_pdfs_from_folder` em segundo plano."""
+
+    def __init__(self, folder: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.folder = folder
+        self.status = "pending"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.task = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("pending", "running", "cancelling")
+
+    def as_dict(self) -> dict:
+        progress = self.result
+        if progress is None and self.status in ("running", "cancelling") and rag_loader.last_progress:
+            progress = rag_loader.last_progress.as_dict()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "folder": self.folder,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": progress,
+            "error": self.error,
+        }
+
+
+class ReindexJobs:
+    """
+    Executa reindexações em segundo plano, uma por vez.
+
+    Pedir uma reindexação enquanto outra está ativa devolve o job em
+    andamento. As buscas continuam sendo atendidas durante a execução.
+    """
+
+    def __init__(self, history: int = REINDEX_JOBS_HISTORY):
+        self.history = history
+        self._jobs = OrderedDict()
+        self._current = None
+
+    def start(self, folder: str) -> ReindexJob:
+        if self._current is not None and self._current.active:
+            return self._current
+
+        job = ReindexJob(folder)
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.history:
+            self._jobs.popitem(last=False)
+        self._current = job
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    async def _run(self, job: ReindexJob):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = await asyncio.to_thread(rag_loader.load_pdfs_from_folder, job.folder, job.cancel_event)
+            job.status = "cancelled" if job.cancel_event.is_set() else "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"[RAG] Erro na reindexação {job.id}: {e}")
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def latest(self):
+        return self._current
+
+    def cancel(self, job_id: str):
+        """Sinaliza o cancelamento; o job termina ao fim do lote em andamento."""
+        job = self._jobs.get(job_id)
+        if job is not None and job.active:
+            job.cancel_event.set()
+            job.status = "cancelling"
+        return job
+
+    async def shutdown(self):
+        job = self._current
+        if job is not None and job.active:
+            job.cancel_event.set()
+            await asyncio.gather(job.task, return_exceptions=True)
+
+
+reindex_jobs = ReindexJobs()
@@ -1,5 +1,10 @@
-from fastapi import FastAPI
-from rag_loader import load_pdfs_from_folder, search
+import asyncio
+
+from fastapi import FastAPI, HTTPException
+
+import embeddings
+import rag_loader
+from jobs import reindex_jobs
 
 app = FastAPI(title="RAG Service")
 
@@ -12,33 +17,62 @@ def health():
     return {"status": "ok"}
 
 @app.on_event("startup")
-def startup_event():
-    try:
-        print("[RAG] Carregando PDFs automaticamente...")
-        load_pdfs_from_folder("./pdfs")
-    except Exception as e:
-        print(f"[RAG] Erro ao carregar PDFs: {e}")
+async def startup_event():
+    # A carga inicial roda em segundo plano: o serviço já atende buscas
+    print("[RAG] Carregando PDFs automaticamente...")
+    reindex_jobs.start("./pdfs")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await reindex_jobs.shutdown()
+    await embeddings.aclose()
 
 @app.post("/rag/search")
-def rag_search(body: dict):
+async def rag_search(body: dict):
     query = body.get("query")
     k = body.get("k", 4)
-    return {"results": search(query, k)}
-
-@app.post("/rag/reload")
-def reload_pdfs():
+    mode = body.get("mode")
     try:
-        load_pdfs_from_folder("./pdfs")
-        return {"status": "success", "message": "PDFs recarregados com sucesso"}
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+        results = await rag_loader.search(query, k, mode, body.get("filters"), body.get("rerank"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"results": results}
+
+@app.post("/rag/reload", status_code=202)
+async def reload_pdfs():
+    """Inicia (ou retorna a já em andamento) reindexação em segundo plano"""
+    job = reindex_jobs.start("./pdfs")
+    return {"status": "accepted", "job_id": job.id, "job": job.as_dict()}
+
+@app.get("/rag/reload/{job_id}")
+async def reload_status(job_id: str):
+    job = reindex_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job.as_dict()
+
+@app.delete("/rag/reload/{job_id}")
+async def cancel_reload(job_id: str):
+    job = reindex_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job.as_dict()
 
 @app.get("/rag/status")
-def get_status():
+async def get_status():
     """Verifica quantos documentos estão indexados"""
-    from rag_loader import collection
     try:
-        count = collection.count()
-        return {"status": "ok", "indexed_documents": count}
+        count = await asyncio.to_thread(rag_loader.collection.count)
+        progress = rag_loader.last_progress
+        job = reindex_jobs.latest()
+        return {
+            "status": "ok",
+            "indexed_documents": count,
+            "lexical_index_documents": len(rag_loader.bm25_index),
+            "indexing": progress.as_dict() if progress else None,
+            "reindex_job": job.as_dict() if job else None,
+            "embedding_cache": embeddings.embedding_cache.stats(),
+            "query_cache": dict(rag_loader.query_cache.stats(), corpus_version=rag_loader.corpus_version)
+        }
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+
+MANIFEST_VERSION = 1
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class IndexManifest:
+    """
+    Registro dos arquivos já indexados: hash do conteúdo de cada PDF e hash
+    de cada chunk gravado no ChromaDB.
+
+    Formato: {"version": 1, "settings": {...}, "files": {nome: {"sha256",
+    "size", "mtime_ns", "chunks": {chunk_id: hash}}}}
+
+    `settings` guarda a configuração que determina os chunks (ex: tamanho e
+    sobreposição); se ela mudar, todos os arquivos são tratados como alterados.
+    """
+
+    def __init__(self, path: str, settings: dict = None):
+        self.path = path
+        self.settings = settings or {}
+        self.settings_changed = False
+        self.files = {}
+
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    content = json.load(f)
+                if content.get("version") == MANIFEST_VERSION:
+                    self.files = content["files"]
+                    self.settings_changed = content.get("settings", {}) != self.settings
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[RAG] Manifesto inválido, reindexando tudo: {e}")
+
+    def chunks(self, file_name: str) -> dict:
+        return self.files.get(file_name, {}).get("chunks", {})
+
+    def check(self, path: str):
+        """
+        Verifica se o PDF mudou desde a última indexação.
+
+        Compara tamanho e mtime primeiro; o hash do conteúdo só é calculado
+        quando eles diferem.
+
+        Returns:
+            tuple: (mudou, entrada) — `entrada` traz sha256/size/mtime_ns atuais
+        """
+        file_name = os.path.basename(path)
+        stat = os.stat(path)
+        entry = self.files.get(file_name)
+        if self.settings_changed:
+            entry = None
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return False, entry
+
+        current = {"sha256": sha256_file(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        if entry and entry["sha256"] == current["sha256"]:
+            # Só os metadados do arquivo mudaram (ex: cópia, touch)
+            entry.update(current)
+            return False, entry
+        return True, current
+
+    def save(self):
+        """Grava o manifesto de forma atômica."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "settings": self.settings, "files": self.files}, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,47 @@
+import os
+
+from pypdf import PdfReader
+
+from text_processing import chunk_text, normalize_text
+
+# Processos de extração de texto (CPU) usados na indexação
+RAG_EXTRACT_WORKERS = int(os.getenv("RAG_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Páginas por tarefa: PDFs grandes são divididos em faixas processadas em paralelo
+RAG_EXTRACT_PAGES_PER_TASK = int(os.getenv("RAG_EXTRACT_PAGES_PER_TASK", "16"))
+
+
+def document_info(path: str, pages_per_task: int = RAG_EXTRACT_PAGES_PER_TASK):
+    """
+    Lê o PDF uma única vez e devolve as faixas de páginas [início, fim) de
+    até `pages_per_task` e a data do documento (inteiro AAAAMMDD) segundo os
+    metadados: criação ou, na falta, última modificação. None se não houver.
+
+    Returns:
+        tuple: (lista de faixas, data ou None)
+    """
+    reader = PdfReader(path)
+    total = len(reader.pages)
+    ranges = [(start, min(start + pages_per_task, total)) for start in range(0, total, pages_per_task)]
+    try:
+        info = reader.metadata
+        date = info and (info.creation_date or info.modification_date)
+    except Exception:
+        date = None
+    return ranges, int(date.strftime("%Y%m%d")) if date else None
+
+
+def extract_chunks(path: str, start: int, end: int):
+    """
+    Extrai, limpa e quebra em chunks as páginas [start, end) do PDF.
+
+    Executada nos processos do pool; devolve apenas os chunks da faixa,
+    então a memória por tarefa fica limitada ao tamanho da faixa.
+
+    Returns:
+        list: Tuplas (índice da página, lista de chunks)
+    """
+    reader = PdfReader(path)
+    return [
+        (page_index, chunk_text(normalize_text(reader.pages[page_index].extract_text() or "")))
+        for page_index in range(start, end)
+    ]
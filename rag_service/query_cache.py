@@ -0,0 +1,64 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+RAG_QUERY_CACHE_MAX_ENTRIES = int(os.getenv("RAG_QUERY_CACHE_MAX_ENTRIES", "512"))
+RAG_QUERY_CACHE_TTL = float(os.getenv("RAG_QUERY_CACHE_TTL", "3600"))
+
+
+def normalize_query(query: str) -> str:
+    """Padroniza caixa e espaços da consulta para uso na chave do cache."""
+    return " ".join((query or "").lower().split())
+
+
+class QueryCache:
+    """
+    Cache LRU dos resultados de /rag/search.
+
+    As chaves incluem a versão do acervo: quando a indexação altera a
+    coleção, a versão muda e resultados antigos deixam de ser servidos.
+    """
+
+    def __init__(self, max_entries: int = RAG_QUERY_CACHE_MAX_ENTRIES, ttl: float = RAG_QUERY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            }
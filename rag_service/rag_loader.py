@@ -1,105 +1,539 @@
+import asyncio
+import json
 import os
 import glob
-import requests
-from pypdf import PdfReader
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 import chromadb
-import re
 
-OLLAMA_URL = os.getenv("OLLAMA_URL", "http://ollama:11434")
-EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+from bm25 import BM25Index, is_keyword_query
+from embedding_cache import EMBED_NORMALIZATION
+from embeddings import EMBED_BATCH_SIZE, EMBED_CONCURRENCY, aembed_text, embed_batch
+from manifest import IndexManifest, sha256_text
+from pdf_extraction import RAG_EXTRACT_WORKERS, document_info, extract_chunks
+from query_cache import QueryCache, normalize_query
+from reranker import RAG_RERANK, RAG_RERANK_CANDIDATES, rerank
+from search_filters import build_where, coffee_tags, matches, normalize_filters
+from text_processing import chunking_settings
+
 CHROMA_PATH = os.getenv("CHROMA_PATH", "/data/chroma")
+# Manifesto de hashes dos arquivos/chunks indexados (ao lado do CHROMA_PATH)
+INDEX_MANIFEST_PATH = os.getenv("INDEX_MANIFEST_PATH", f"{CHROMA_PATH.rstrip('/')}_manifest.json")
+# Intervalo mínimo (segundos) entre logs de progresso da indexação
+INDEX_PROGRESS_INTERVAL = float(os.getenv("INDEX_PROGRESS_INTERVAL", "5"))
+# Modo padrão de busca: auto, hybrid, vector ou lexical
+RAG_SEARCH_MODE = os.getenv("RAG_SEARCH_MODE", "auto")
+# Constante da Reciprocal Rank Fusion (1 / (RRF_K + posição))
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+# Versão dos metadados gravados em cada chunk; mudar força a reindexação
+CHUNK_METADATA_VERSION = 1
 
 # inicializa o ChromaDB
 client = chromadb.PersistentClient(path=CHROMA_PATH)
 collection = client.get_or_create_collection("relatorios")
 
-def embed_text(text: str):
-    r = requests.post(
-        f"{OLLAMA_URL}/api/embeddings",
-        json={"model": EMBED_MODEL, "prompt": text}
-    )
-    return r.json()["embedding"]
+# índice léxico mantido junto com a coleção (reconstruído no startup)
+bm25_index = BM25Index()
+_bm25_lock = threading.Lock()
 
-def load_pdfs_from_folder(folder="./pdfs"):
-    pdf_paths = glob.glob(os.path.join(folder, "*.pdf"))
-    print(f"[RAG] Encontrados {len(pdf_paths)} PDFs para indexar.")
+# Versão do acervo: muda a cada alteração da coleção e invalida o cache de buscas
+corpus_version = 0
+query_cache = QueryCache()
+
+_FIM = object()
+
+
+class IndexProgress:
+    """Contadores de progresso e vazão da indexação em andamento."""
+
+    def __init__(self, total_files=0):
+        self.total_files = total_files
+        self.files_done = 0
+        self.files_skipped = 0
+        self.files_removed = 0
+        self.pages_extracted = 0
+        self.chunks_unchanged = 0
+        self.chunks_deleted = 0
+        self.chunks_embedded = 0
+        self.chunks_written = 0
+        self.errors = 0
+        self.cancelled = False
+        self.started_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._last_log = 0.0
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self):
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "running": self.finished_at is None,
+            "cancelled": self.cancelled,
+            "files": f"{self.files_done}/{self.total_files}",
+            "files_skipped": self.files_skipped,
+            "files_removed": self.files_removed,
+            "pages_extracted": self.pages_extracted,
+            "chunks_unchanged": self.chunks_unchanged,
+            "chunks_deleted": self.chunks_deleted,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_written": self.chunks_written,
+            "errors": self.errors,
+            "elapsed_s": round(elapsed, 1),
+            "pages_per_s": round(self.pages_extracted / elapsed, 2) if elapsed else 0.0,
+            "embeddings_per_s": round(self.chunks_embedded / elapsed, 2) if elapsed else 0.0,
+        }
+
+    def log(self, force=False):
+        now = time.time()
+        if not force and now - self._last_log < INDEX_PROGRESS_INTERVAL:
+            return
+        self._last_log = now
+        d = self.as_dict()
+        print(
+            f"[RAG] Progresso: arquivos {d['files']}, páginas extraídas {d['pages_extracted']}, "
+            f"chunks gravados {d['chunks_written']} ({d['pages_per_s']} páginas/s, "
+            f"{d['embeddings_per_s']} embeddings/s)"
+        )
+
+
+# Progresso da última indexação (exposto em /rag/status)
+last_progress = None
+
+
+def _chunk_records(file_name, page_index, chunks, entry, indexed, progress):
+    """Registra os hashes dos chunks da página e devolve os que mudaram."""
+    records = []
+    for chunk_index, chunk in enumerate(chunks):
+        chunk_id = f"{file_name}_p{page_index}_c{chunk_index}"
+        metadata = {
+            "file": file_name,
+            "page": page_index,
+            "chunk": chunk_index,
+            "start": chunk["start"],
+            "end": chunk["end"],
+            **coffee_tags(chunk["text"]),
+        }
+        if entry.get("date"):
+            metadata["date"] = entry["date"]
+
+        # O hash cobre texto e metadados: mudar só a data do documento
+        # também regrava o chunk
+        chunk_hash = sha256_text(json.dumps([chunk["text"], metadata], sort_keys=True))
+        entry["chunks"][chunk_id] = chunk_hash
+
+        if indexed.get(chunk_id) == chunk_hash:
+            progress.add(chunks_unchanged=1)
+            continue
+
+        records.append({"id": chunk_id, "text": chunk["text"], "metadata": metadata})
+    return records
+
+
+def _finish_file(file_name, entry, manifest, writes, progress):
+    """Chamada quando todas as faixas de páginas do arquivo foram extraídas."""
+    if not entry.get("failed"):
+        indexed = manifest.chunks(file_name)
+        stale = [chunk_id for chunk_id in indexed if chunk_id not in entry["chunks"]]
+        if stale:
+            writes.put({"delete": stale})
+        entry["done"] = True
+    progress.add(files_done=1)
 
-    for pdf_path in pdf_paths:
-        file_name = os.path.basename(pdf_path)
-        print(f"[RAG] Processando PDF: {file_name}")
 
+def _extract_stage(pending, manifest, batches, writes, progress, cancel):
+    """
+    Etapa 1: extrai e limpa o texto das páginas dos arquivos novos/alterados,
+    quebra em chunks e agrupa em lotes para embedding. Chunks cujo hash não
+    mudou são pulados e os que deixaram de existir são enviados para remoção.
+
+    A extração (CPU) roda num pool de processos, em faixas de páginas; no
+    máximo 2 × RAG_EXTRACT_WORKERS faixas ficam em andamento e os chunks de
+    cada faixa seguem para o embedding assim que ela termina. Cada PDF é
+    aberto (páginas e data) só quando suas faixas vão ser enviadas ao pool.
+    """
+    batch = []
+    remaining = {}
+
+    def fail(file_name, error):
+        if not pending[file_name].get("failed"):
+            pending[file_name]["failed"] = True
+            progress.add(errors=1)
+            print(f"[RAG] Erro processando {file_name}: {error}")
+
+    def tasks():
+        for file_name, entry in pending.items():
+            try:
+                ranges, entry["date"] = document_info(entry["path"])
+            except Exception as e:
+                fail(file_name, e)
+                progress.add(files_done=1)
+                continue
+            remaining[file_name] = len(ranges)
+            if not ranges:
+                _finish_file(file_name, entry, manifest, writes, progress)
+            for start, end in ranges:
+                yield file_name, start, end
+
+    try:
+        # forkserver: o pool é criado numa thread, com o event loop, os
+        # embeddings e o escritor do ChromaDB rodando; fork copiaria o
+        # processo com locks dessas threads possivelmente travados
+        context = multiprocessing.get_context("forkserver")
+        with ProcessPoolExecutor(max_workers=RAG_EXTRACT_WORKERS, mp_context=context) as pool:
+            in_flight = {}
+            task_iter = tasks()
+            while True:
+                while not cancel.is_set() and len(in_flight) < RAG_EXTRACT_WORKERS * 2:
+                    task = next(task_iter, None)
+                    if task is None:
+                        break
+                    file_name, start, end = task
+                    if start == 0:
+                        print(f"[RAG] Processando PDF: {file_name}")
+                    in_flight[pool.submit(extract_chunks, pending[file_name]["path"], start, end)] = task
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_name, start, end = in_flight.pop(future)
+                    entry = pending[file_name]
+                    try:
+                        pages = future.result()
+                    except Exception as e:
+                        fail(file_name, e)
+                        pages = []
+                    progress.add(pages_extracted=len(pages))
+
+                    if not entry.get("failed"):
+                        indexed = manifest.chunks(file_name)
+                        for page_index, chunks in pages:
+                            batch.extend(_chunk_records(file_name, page_index, chunks, entry, indexed, progress))
+                            while len(batch) >= EMBED_BATCH_SIZE:
+                                batches.put(batch[:EMBED_BATCH_SIZE])
+                                batch = batch[EMBED_BATCH_SIZE:]
+
+                    remaining[file_name] -= 1
+                    if remaining[file_name] == 0:
+                        _finish_file(file_name, entry, manifest, writes, progress)
+
+        if batch and not cancel.is_set():
+            batches.put(batch)
+    finally:
+        batches.put(_FIM)
+
+
+def _mark_failed(pending, batch):
+    for chunk in batch:
+        pending[chunk["metadata"]["file"]]["failed"] = True
+
+
+def _bump_corpus_version():
+    global corpus_version
+    corpus_version += 1
+    query_cache.clear()
+
+
+def _write_stage(pending, writes, progress):
+    """Etapa 3: grava no ChromaDB os lotes já embedados (única thread escritora)."""
+    while True:
+        item = writes.get()
+        if item is _FIM:
+            return
         try:
-            reader = PdfReader(pdf_path)
-            texts = []
-            ids = []
-            metadatas = []
-
-            for page_index, page in enumerate(reader.pages):
-                text = page.extract_text() or ""
-                chunk_id = f"{file_name}_p{page_index}"
-
-                texts.append(text)
-                ids.append(chunk_id)
-                metadatas.append({
-                    "file": file_name,
-                    "page": page_index
-                })
-
-            # gera embeddings
-            embeddings = [embed_text(t) for t in texts]
-
-            # salva na coleção
-            collection.add(
-                ids=ids,
-                documents=texts,
-                embeddings=embeddings,
-                metadatas=metadatas
+            if isinstance(item, dict):
+                collection.delete(ids=item["delete"])
+                bm25_index.delete(item["delete"])
+                _bump_corpus_version()
+                progress.add(chunks_deleted=len(item["delete"]))
+                continue
+
+            collection.upsert(
+                ids=[c["id"] for c in item],
+                documents=[c["text"] for c in item],
+                embeddings=[c["embedding"] for c in item],
+                metadatas=[c["metadata"] for c in item]
             )
+            bm25_index.upsert(
+                [c["id"] for c in item], [c["text"] for c in item], [c["metadata"] for c in item]
+            )
+            _bump_corpus_version()
+            progress.add(chunks_written=len(item))
+        except Exception as e:
+            if not isinstance(item, dict):
+                _mark_failed(pending, item)
+            progress.add(errors=1)
+            print(f"[RAG] Erro gravando no ChromaDB: {e}")
+        progress.log()
+
+
+def _remove_files(manifest, file_names, progress):
+    """Remove do ChromaDB os chunks de arquivos que saíram da pasta."""
+    for file_name in file_names:
+        ids = list(manifest.chunks(file_name))
+        try:
+            if ids:
+                collection.delete(ids=ids)
+                bm25_index.delete(ids)
+            else:
+                collection.delete(where={"file": file_name})
+                bm25_index.delete_file(file_name)
+            _bump_corpus_version()
+        except Exception as e:
+            progress.add(errors=1)
+            print(f"[RAG] Erro removendo {file_name}: {e}")
+            continue
+        del manifest.files[file_name]
+        progress.add(files_removed=1, chunks_deleted=len(ids))
+        print(f"[RAG] PDF removido do índice: {file_name}")
+
+
+def load_pdfs_from_folder(folder="./pdfs", cancel=None):
+    """
+    Indexa os PDFs da pasta em um pipeline de três etapas simultâneas:
+    extração de texto, embedding em lotes (até EMBED_CONCURRENCY requisições
+    ao Ollama em paralelo) e gravação no ChromaDB.
+
+    Cada página é limpa (`normalize_text`) e quebrada em chunks com sobreposição
+    (`chunk_text`); cada chunk vira um documento com arquivo, página,
+    posições no texto da página, data do documento e tipos de café
+    mencionados nos metadados (usados nos filtros da busca).
+
+    A indexação é incremental: o manifesto guarda o hash de cada arquivo e
+    de cada chunk, de modo que apenas arquivos novos/alterados são lidos,
+    só chunks alterados são re-embedados (via upsert) e os chunks de
+    arquivos removidos são apagados. Mudar a configuração de chunking
+    força o reprocessamento de todos os arquivos.
+
+    Args:
+        folder (str): Pasta com os PDFs
+        cancel (threading.Event, opcional): Quando sinalizado, a extração
+            para e os lotes ainda não embedados são descartados; arquivos
+            incompletos são reprocessados na próxima carga
+
+    Returns:
+        dict: Resumo de progresso e vazão da indexação
+    """
+    global last_progress
+
+    cancel = cancel or threading.Event()
+    pdf_paths = sorted(glob.glob(os.path.join(folder, "*.pdf")))
+    print(f"[RAG] Encontrados {len(pdf_paths)} PDFs para indexar.")
 
-            print(f"[RAG] PDF '{file_name}' indexado com sucesso.")
+    progress = IndexProgress(total_files=len(pdf_paths))
+    last_progress = progress
 
+    manifest = IndexManifest(INDEX_MANIFEST_PATH, settings=dict(chunking_settings(), metadata=CHUNK_METADATA_VERSION, embedding=EMBED_NORMALIZATION))
+    if manifest.files and collection.count() == 0:
+        print("[RAG] Coleção vazia; ignorando manifesto e reindexando tudo.")
+        manifest.files = {}
+    _ensure_lexical_index()
+
+    current = {os.path.basename(path): path for path in pdf_paths}
+    _remove_files(manifest, [name for name in list(manifest.files) if name not in current], progress)
+
+    pending = {}
+    for file_name, path in current.items():
+        try:
+            changed, entry = manifest.check(path)
+        except OSError as e:
+            progress.add(errors=1)
+            print(f"[RAG] Erro lendo {file_name}: {e}")
+            continue
+        if changed:
+            pending[file_name] = dict(entry, path=path, chunks={})
+        else:
+            progress.add(files_done=1, files_skipped=1)
+
+    # Filas limitadas: a extração não avança muito além do embedding
+    batches = queue.Queue(maxsize=EMBED_CONCURRENCY * 2)
+    writes = queue.Queue(maxsize=EMBED_CONCURRENCY * 2)
+    in_flight = threading.Semaphore(EMBED_CONCURRENCY)
+
+    extractor = threading.Thread(
+        target=_extract_stage, args=(pending, manifest, batches, writes, progress, cancel), daemon=True
+    )
+    writer = threading.Thread(target=_write_stage, args=(pending, writes, progress), daemon=True)
+    extractor.start()
+    writer.start()
+
+    def embed(batch):
+        try:
+            if cancel.is_set():
+                _mark_failed(pending, batch)
+                return
+            embeddings = embed_batch([c["text"] for c in batch])
+            for chunk, embedding in zip(batch, embeddings):
+                chunk["embedding"] = embedding
+            progress.add(chunks_embedded=len(batch))
+            writes.put(batch)
         except Exception as e:
-            print(f"[RAG] Erro processando {file_name}: {e}")
+            _mark_failed(pending, batch)
+            progress.add(errors=1)
+            print(f"[RAG] Erro gerando embeddings ({batch[0]['id']}...): {e}")
+        finally:
+            in_flight.release()
+
+    # Etapa 2: embedding concorrente dos lotes extraídos
+    with ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY, thread_name_prefix="embed") as executor:
+        while True:
+            batch = batches.get()
+            if batch is _FIM:
+                break
+            in_flight.acquire()
+            executor.submit(embed, batch)
 
-def clean_text(text: str) -> str:
-    # Remove múltiplas quebras de linha
-    text = re.sub(r"\n\s*\n+", "\n\n", text)
-    
-    # Remove espaços duplicados
-    text = re.sub(r" {2,}", " ", text)
+    writes.put(_FIM)
+    writer.join()
+    extractor.join()
 
-    # Remove números isolados quebrados (ruído comum em PDFs)
-    text = re.sub(r"\b\d+\s+\n", "", text)
+    # Só entram no manifesto os arquivos indexados por completo e sem erro;
+    # os demais são reprocessados na próxima carga
+    for file_name, entry in pending.items():
+        if entry.get("done") and not entry.get("failed"):
+            manifest.files[file_name] = {
+                key: entry[key] for key in ("sha256", "size", "mtime_ns", "chunks")
+            }
+        elif file_name in manifest.files:
+            # Mantém os chunks antigos (para remoção futura), mas invalida o hash
+            manifest.files[file_name].update(sha256="", size=-1)
+    try:
+        manifest.save()
+    except OSError as e:
+        print(f"[RAG] Erro salvando manifesto: {e}")
 
-    # Remove códigos de página soltos
-    text = re.sub(r"^\s*\d+\s*$", "", text, flags=re.MULTILINE)
+    progress.cancelled = cancel.is_set()
+    progress.finished_at = time.time()
+    progress.log(force=True)
+    return progress.as_dict()
 
-    # Remove texto "quebrado" que está no meio de palavras
-    text = text.replace(" \n", " ").replace("\n ", " ")
+def _ensure_lexical_index():
+    """Reconstrói o índice BM25 a partir do ChromaDB se ele ainda estiver vazio."""
+    with _bm25_lock:
+        if len(bm25_index) == 0 and collection.count() > 0:
+            bm25_index.rebuild(collection)
+            print(f"[RAG] Índice léxico reconstruído com {len(bm25_index)} chunks.")
 
-    # Normaliza novas linhas
-    text = text.replace("\n", " ").strip()
 
-    return text
+async def _vector_search(query: str, k: int, filters=None):
+    vec = await aembed_text(query)
 
-def search(query: str, k: int = 5):
-    vec = embed_text(query)
+    # Os filtros viram uma cláusula `where`, aplicada pelo próprio ChromaDB
+    where = build_where(filters)
+    extra = {"where": where} if where else {}
 
-    res = collection.query(
+    # O cliente do ChromaDB é síncrono: a consulta roda numa thread
+    res = await asyncio.to_thread(
+        collection.query,
         query_embeddings=[vec],
         n_results=k,
-        include=["documents", "metadatas", "distances"]
+        include=["documents", "metadatas", "distances"],
+        **extra
     )
 
     results = []
     for i in range(len(res["ids"][0])):
-        raw_text = res["documents"][0][i]
-        cleaned_text = clean_text(raw_text)
-
+        # Os chunks já são limpos na indexação
         results.append({
-            "text": cleaned_text,
+            "id": res["ids"][0][i],
+            "text": res["documents"][0][i],
             "metadata": res["metadatas"][0][i],
             "distance": res["distances"][0][i]
         })
 
     return results
+
+
+async def _lexical_search(query: str, k: int, filters=None):
+    if len(bm25_index) == 0:
+        await asyncio.to_thread(_ensure_lexical_index)
+    # Pontuação em thread: percorre o índice inteiro e disputa o lock com a
+    # indexação em segundo plano, o que travaria o event loop
+    return await asyncio.to_thread(_lexical_search_sync, query, k, filters)
+
+
+def _lexical_search_sync(query: str, k: int, filters=None):
+    where = (lambda metadata: matches(metadata, filters)) if filters else None
+    return [
+        dict(bm25_index.document(doc_id), id=doc_id, score=round(score, 4))
+        for doc_id, score in bm25_index.search(query, k, where)
+    ]
+
+
+def _reciprocal_rank_fusion(rankings, k: int):
+    """Combina rankings somando 1 / (RAG_RRF_K + posição) de cada documento."""
+    scores = {}
+    docs = {}
+    for ranking in rankings:
+        for position, result in enumerate(ranking):
+            scores[result["id"]] = scores.get(result["id"], 0.0) + 1.0 / (RAG_RRF_K + position + 1)
+            docs.setdefault(result["id"], result)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [dict(docs[doc_id], score=round(scores[doc_id], 5)) for doc_id in best]
+
+
+async def search(query: str, k: int = 5, mode: str = None, filters: dict = None, rerank_results: bool = None):
+    """
+    Busca os chunks mais relevantes para a consulta.
+
+    Resultados ficam em cache por (versão do acervo, consulta normalizada,
+    k, modo, filtros, re-ranking); qualquer alteração na coleção muda a versão.
+
+    Modos:
+        vector: similaridade de embeddings (ChromaDB)
+        lexical: BM25 sobre o texto dos chunks, sem chamar o Ollama
+        hybrid: funde os dois rankings com Reciprocal Rank Fusion
+        auto: lexical quando a consulta tem formato de palavras-chave e
+              retorna resultados suficientes; hybrid nos demais casos
+
+    Args:
+        filters (dict, opcional): file, coffee_type, date_from e date_to
+            (ver `normalize_filters`); levanta ValueError se inválidos
+        rerank_results (bool, opcional): recupera RAG_RERANK_CANDIDATES
+            candidatos e devolve os k melhores segundo `rerank`
+            (padrão: RAG_RERANK)
+    """
+    mode = mode or RAG_SEARCH_MODE
+    filters = normalize_filters(filters)
+    if rerank_results is None:
+        rerank_results = RAG_RERANK
+
+    # Versão lida antes da busca: um resultado calculado durante uma
+    # reindexação fica associado à versão antiga e não é reaproveitado
+    key = (corpus_version, normalize_query(query), k, mode, filters, rerank_results)
+    results = query_cache.get(key)
+    if results is None:
+        if rerank_results:
+            candidates = await _search(query, max(k, RAG_RERANK_CANDIDATES), mode, filters)
+            results = await asyncio.to_thread(rerank, query, candidates, k)
+        else:
+            results = await _search(query, k, mode, filters)
+        query_cache.set(key, results)
+    return results
+
+
+async def _search(query: str, k: int, mode: str, filters=None):
+    if mode == "auto":
+        if is_keyword_query(query):
+            results = await _lexical_search(query, k, filters)
+            if len(results) >= k:
+                return results
+        mode = "hybrid"
+
+    if mode == "vector":
+        return await _vector_search(query, k, filters)
+    if mode == "lexical":
+        return await _lexical_search(query, k, filters)
+
+    candidates = max(k * 4, 20)
+    vector, lexical = await asyncio.gather(
+        _vector_search(query, candidates, filters), _lexical_search(query, candidates, filters)
+    )
+    return _reciprocal_rank_fusion([vector, lexical], k)
@@ -0,0 +1,41 @@
+import os
+
+from bm25 import tokenize
+
+# Re-ranking habilitado por padrão nas buscas (pode ser pedido por busca com "rerank")
+RAG_RERANK = os.getenv("RAG_RERANK", "false").lower() in ("1", "true", "yes")
+# Candidatos recuperados para o re-ranking escolher os k melhores
+RAG_RERANK_CANDIDATES = int(os.getenv("RAG_RERANK_CANDIDATES", "20"))
+
+# Pesos de cada sinal no score final
+WEIGHT_RANK = 0.4
+WEIGHT_COVERAGE = 0.4
+WEIGHT_PHRASE = 0.2
+
+
+def rerank(query: str, candidates: list, k: int) -> list:
+    """
+    Reordena os candidatos da busca e devolve os `k` melhores.
+
+    Combina três sinais baratos (sem modelo adicional): a posição no ranking
+    original, a fração dos termos da consulta presentes no trecho e a fração
+    dos pares de termos consecutivos da consulta que aparecem juntos no
+    trecho (trechos que repetem a expressão da consulta sobem).
+    """
+    terms = tokenize(query)
+    if not terms or len(candidates) <= 1:
+        return candidates[:k]
+
+    query_terms = set(terms)
+    query_pairs = set(zip(terms, terms[1:]))
+    scored = []
+    for position, candidate in enumerate(candidates):
+        tokens = tokenize(candidate["text"])
+        coverage = len(query_terms.intersection(tokens)) / len(query_terms)
+        phrase = len(query_pairs.intersection(zip(tokens, tokens[1:]))) / len(query_pairs) if query_pairs else 0.0
+        rank = 1.0 - position / len(candidates)
+        score = WEIGHT_RANK * rank + WEIGHT_COVERAGE * coverage + WEIGHT_PHRASE * phrase
+        scored.append((score, position, candidate))
+
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [dict(candidate, rerank_score=round(score, 4)) for score, _, candidate in scored[:k]]
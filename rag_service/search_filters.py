@@ -0,0 +1,103 @@
+from datetime import datetime
+
+from bm25 import tokenize
+
+# Tipos de café marcados nos metadados de cada chunk e os termos (sem
+# acento, minúsculos) que indicam que o trecho trata daquele tipo
+COFFEE_TYPES = {
+    "arabica": ("arabica",),
+    "robusta": ("robusta", "conilon", "canephora", "canefora"),
+}
+
+FILTER_KEYS = ("file", "coffee_type", "date_from", "date_to")
+
+_DATE_FORMATS = (("%Y-%m-%d", "%Y%m%d"), ("%Y-%m", "%Y%m"), ("%Y", "%Y"))
+
+
+def coffee_tags(text: str) -> dict:
+    """Marca quais tipos de café são mencionados no texto."""
+    tokens = set(tokenize(text))
+    return {name: any(term in tokens for term in terms) for name, terms in COFFEE_TYPES.items()}
+
+
+def _parse_date(value, end: bool) -> int:
+    """Converte "AAAA", "AAAA-MM" ou "AAAA-MM-DD" no inteiro AAAAMMDD."""
+    for fmt, digits in _DATE_FORMATS:
+        try:
+            date = datetime.strptime(str(value), fmt)
+        except ValueError:
+            continue
+        number = int(date.strftime(digits))
+        if digits == "%Y":
+            return number * 10000 + (1231 if end else 101)
+        if digits == "%Y%m":
+            return number * 100 + (31 if end else 1)
+        return number
+    raise ValueError(f"Data inválida no filtro: {value!r} (use AAAA, AAAA-MM ou AAAA-MM-DD)")
+
+
+def normalize_filters(filters: dict):
+    """
+    Valida os filtros da busca e devolve uma forma canônica (hashable, usada
+    também na chave do cache), ou None quando não há filtros.
+
+    Filtros aceitos:
+        file: nome do PDF ou lista de nomes
+        coffee_type: "arabica" ou "robusta"
+        date_from / date_to: data do documento (AAAA, AAAA-MM ou AAAA-MM-DD)
+    """
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError("'filters' deve ser um objeto")
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Filtros desconhecidos: {', '.join(sorted(unknown))}")
+
+    normalized = []
+    files = filters.get("file")
+    if files:
+        files = [files] if isinstance(files, str) else list(files)
+        normalized.append(("file", tuple(sorted(set(files)))))
+    coffee_type = filters.get("coffee_type")
+    if coffee_type:
+        coffee_type = str(coffee_type).lower()
+        if coffee_type not in COFFEE_TYPES:
+            raise ValueError(f"Tipo de café inválido: {coffee_type!r} (use {' ou '.join(COFFEE_TYPES)})")
+        normalized.append(("coffee_type", coffee_type))
+    if filters.get("date_from"):
+        normalized.append(("date_from", _parse_date(filters["date_from"], end=False)))
+    if filters.get("date_to"):
+        normalized.append(("date_to", _parse_date(filters["date_to"], end=True)))
+    return tuple(normalized) or None
+
+
+def build_where(filters):
+    """Cláusula `where` do ChromaDB para filtros já normalizados."""
+    conditions = []
+    for name, value in filters or ():
+        if name == "file":
+            conditions.append({"file": value[0]} if len(value) == 1 else {"file": {"$in": list(value)}})
+        elif name == "coffee_type":
+            conditions.append({value: True})
+        elif name == "date_from":
+            conditions.append({"date": {"$gte": value}})
+        elif name == "date_to":
+            conditions.append({"date": {"$lte": value}})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def matches(metadata: dict, filters) -> bool:
+    """Mesma semântica de `build_where`, avaliada sobre os metadados de um chunk."""
+    for name, value in filters or ():
+        if name == "file" and metadata.get("file") not in value:
+            return False
+        if name == "coffee_type" and metadata.get(value) is not True:
+            return False
+        if name == "date_from" and not (metadata.get("date") or 0) >= value:
+            return False
+        if name == "date_to" and not (metadata.get("date") and metadata["date"] <= value):
+            return False
+    return True
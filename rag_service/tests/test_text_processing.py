@@ -0,0 +1,60 @@
+"""
+Equivalência entre `normalize_text` (regex pré-compiladas) e `clean_text`,
+a limpeza de referência das páginas dos PDFs.
+
+Uso:
+    python -m pytest tests
+"""
+
+import random
+
+import pytest
+
+from text_processing import clean_text, normalize_text
+
+# Alfabetos dos textos sintéticos: palavras, dígitos (inclusive não ASCII e
+# sobrescritos, que não são números), pontuação e os espaços tratados pela
+# limpeza em combinações variadas
+ALFABETOS = [
+    ["a", "b", "1", "2", "٣", ".", "_", " ", " ", "\n", "\n", "\t", "\r", "\x00"],
+    ["1", "2", " ", "\n"],
+    ["1", " ", " ", "\n", "\n", "a", "."],
+    ["12", "3", " ", "  ", "\n", "\n\n", " \n", "\n ", "x", "\t", "٣", "_"],
+    ["1", "\n", " ", "\x0b", "\x0c", "\x85", "\xa0", "\x1c", "\u2028", "\u3000", "a", "á", "¹", "٣", "-"],
+]
+TEXTOS_POR_ALFABETO = 20000
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("texto com quebra no\nmeio", "texto com quebra no meio"),
+    ("Café arábica\n12\nsafra 2024", "Café arábica  safra 2024"),
+    ("Preço  médio\n\n\nR$ 1.234,56", "Preço médio  R$ 1.234,56"),
+    ("ABC123 \nfim", "ABC123 fim"),
+    ("3\nRelatório", "Relatório"),
+    ("Relatório\n  7  ", "Relatório"),
+    ("a 12 \n b", "a  b"),
+    ("٣\nPágina", "Página"),
+    ("linha\r\nseguinte", "linha\r seguinte"),
+    (" 42 ", ""),
+    ("42", ""),
+    ("", ""),
+])
+def test_casos_conhecidos(texto, esperado):
+    assert clean_text(texto) == esperado
+    assert normalize_text(texto) == esperado
+
+
+@pytest.mark.parametrize("indice", range(len(ALFABETOS)))
+def test_textos_aleatorios(indice):
+    rng = random.Random(indice)
+    alfabeto = ALFABETOS[indice]
+    for _ in range(TEXTOS_POR_ALFABETO):
+        texto = "".join(rng.choice(alfabeto) for _ in range(rng.randint(0, 40)))
+        assert normalize_text(texto) == clean_text(texto), f"divergência em {texto!r}"
+
+
+@pytest.mark.parametrize("separador", [" ", "\n", " \n", "  "])
+def test_tabela_de_numeros(separador):
+    # Página só de números (tabelas)
+    texto = separador.join(str(i % 97) for i in range(3000)) + "\n"
+    assert normalize_text(texto) == clean_text(texto)
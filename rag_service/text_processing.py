@@ -0,0 +1,113 @@
+import bisect
+import os
+import re
+
+# Estratégia de chunking: "sentence" (agrupa frases) ou "token" (janela de palavras)
+CHUNK_MODE = os.getenv("CHUNK_MODE", "sentence")
+# Tamanho máximo do chunk e sobreposição entre chunks vizinhos, em tokens (palavras)
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "160"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "32"))
+
+_WORD_RE = re.compile(r"\S+")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?;])\s+")
+
+
+def clean_text(text: str) -> str:
+    # Remove múltiplas quebras de linha
+    text = re.sub(r"\n\s*\n+", "\n\n", text)
+    
+    # Remove espaços duplicados
+    text = re.sub(r" {2,}", " ", text)
+
+    # Remove números isolados quebrados (ruído comum em PDFs)
+    text = re.sub(r"\b\d+\s+\n", "", text)
+
+    # Remove códigos de página soltos
+    text = re.sub(r"^\s*\d+\s*$", "", text, flags=re.MULTILINE)
+
+    # Remove texto "quebrado" que está no meio de palavras
+    text = text.replace(" \n", " ").replace("\n ", " ")
+
+    # Normaliza novas linhas
+    text = text.replace("\n", " ").strip()
+
+    return text
+
+
+# Regras de `clean_text`, pré-compiladas
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+_REPEATED_SPACES_RE = re.compile(r" {2,}")
+_BROKEN_NUMBER_RE = re.compile(r"\b\d+\s+\n")
+_PAGE_NUMBER_RE = re.compile(r"^\s*\d+\s*$", re.MULTILINE)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Mesma limpeza de `clean_text` (a especificação, verificada em
+    `tests/test_text_processing.py`), com as regex pré-compiladas.
+    """
+    text = _BLANK_LINES_RE.sub("\n\n", text)
+    text = _REPEATED_SPACES_RE.sub(" ", text)
+    text = _BROKEN_NUMBER_RE.sub("", text)
+    text = _PAGE_NUMBER_RE.sub("", text)
+    return text.replace(" \n", " ").replace("\n ", " ").replace("\n", " ").strip()
+
+
+def _units(text: str, mode: str, size: int):
+    """
+    Divide o texto em unidades (início, fim, tokens): palavras no modo
+    "token" ou frases no modo "sentence". Frases maiores que `size` são
+    quebradas em janelas de `size` palavras.
+    """
+    words = [(m.start(), m.end()) for m in _WORD_RE.finditer(text)]
+    if mode == "token":
+        return [(start, end, 1) for start, end in words]
+
+    word_starts = [start for start, _ in words]
+    boundaries = [0] + [m.end() for m in _SENTENCE_END_RE.finditer(text)] + [len(text)]
+    units = []
+    for sentence_start, sentence_end in zip(boundaries, boundaries[1:]):
+        first = bisect.bisect_left(word_starts, sentence_start)
+        last = bisect.bisect_left(word_starts, sentence_end)
+        for k in range(first, last, size):
+            window = words[k:min(k + size, last)]
+            units.append((window[0][0], window[-1][1], len(window)))
+    return units
+
+
+def chunk_text(text: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP, mode: str = CHUNK_MODE):
+    """
+    Quebra um texto (já limpo por `normalize_text`) em chunks de até `size`
+    tokens, repetindo no início de cada chunk até `overlap` tokens do final
+    do anterior.
+
+    Returns:
+        list: Dicionários com 'text', 'start' e 'end' (posições no texto)
+    """
+    units = _units(text, mode, size)
+    chunks = []
+    i = 0
+    while i < len(units):
+        j = i
+        total = 0
+        while j < len(units) and (j == i or total + units[j][2] <= size):
+            total += units[j][2]
+            j += 1
+
+        start, end = units[i][0], units[j - 1][1]
+        chunks.append({"text": text[start:end], "start": start, "end": end})
+        if j >= len(units):
+            break
+
+        # Recua sobre as últimas unidades até completar a sobreposição
+        k = j
+        shared = 0
+        while k - 1 > i and shared + units[k - 1][2] <= overlap:
+            k -= 1
+            shared += units[k][2]
+        i = k
+    return chunks
+
+
+def chunking_settings() -> dict:
+    return {"mode": CHUNK_MODE, "size": CHUNK_SIZE, "overlap": CHUNK_OVERLAP}